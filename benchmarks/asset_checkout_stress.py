@@ -0,0 +1,90 @@
+"""
+Hammers check_out()/check_in() on a single asset from many threads and
+verifies that no asset ever has more than one open log.
+
+Usage: python benchmarks/asset_checkout_stress.py [--threads 16] [--rounds 25]
+
+Runs against a throwaway SQLite file unless --database-url points at a
+scratch PostgreSQL database (its tables are created and dropped).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=25)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'stress.db')}"
+
+    from wms import create_app, db
+    from wms.models import User, Asset, AssetLog
+    from wms.assets import check_out, check_in, AssetTransitionError
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        users = [User(username=f'stress{i}', email=f'stress{i}@example.com') for i in range(args.threads)]
+        db.session.add_all(users)
+        db.session.add(Asset(name='Laptop'))
+        db.session.commit()
+        user_ids = [u.id for u in users]
+
+    wins = [0] * args.threads
+    barrier = threading.Barrier(args.threads)
+
+    def worker(n):
+        with app.app_context():
+            for _ in range(args.rounds):
+                barrier.wait()
+                user = db.session.get(User, user_ids[n])
+                asset = db.session.get(Asset, 1)
+                try:
+                    check_out(asset, user)
+                    wins[n] += 1
+                except AssetTransitionError:
+                    pass
+                barrier.wait()
+                db.session.expire_all()
+                asset = db.session.get(Asset, 1)
+                if asset.holder_id == user_ids[n]:
+                    check_in(asset, user)
+                db.session.remove()
+
+    def guarded(n):
+        try:
+            worker(n)
+        except Exception:
+            barrier.abort()  # don't leave the other threads waiting forever
+            raise
+
+    threads = [threading.Thread(target=guarded, args=(n,)) for n in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with app.app_context():
+        logs = AssetLog.query.count()
+        open_logs = AssetLog.query.filter_by(check_in_time=None).count()
+        db.drop_all()
+
+    print(f"{args.threads} threads x {args.rounds} rounds: {sum(wins)} checkouts, {logs} logs, {open_logs} open")
+    if sum(wins) != args.rounds or logs != args.rounds or open_logs:
+        print("FAIL: double checkout detected")
+        sys.exit(1)
+    print("OK: exactly one checkout per round")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Synthetic data generator for the benchmarks.
+
+``seed`` fills an empty database (inside an app context) with a
+deterministic workforce: one Admin, a tenth of the users as Managers, the
+rest Employees, plus their tasks, shifts, attendance, leave requests,
+goals, evaluations, messages, documents and asset history. Everyone's
+password is PASSWORD. Rows are written with bulk INSERTs, and the
+precomputed tables (expiring documents, asset usage, task status
+counters) are rebuilt afterwards so the app sees a consistent database.
+
+Usage: python benchmarks/dataset.py --database-url sqlite:///bench.db [--users 200] [--days 30]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'benchmark-password'
+
+
+def email_for(n):
+    return f'user{n}@example.com'
+
+
+def seed(users=200, days=30, tasks_per_user=10, messages_per_user=20, contacts=5, documents_per_user=3,
+         leave_per_user=2, goals_per_user=2, announcements=None, assets=20, logs_per_asset=30, seed=0):
+    """Insert the dataset and return {role: [user ids]}."""
+    from wms import db
+    from wms.models import (User, Task, TaskBatch, Shift, Attendance, Message, Document, Asset, AssetLog,
+                            Announcement, LeaveRequest, Goal, Evaluation)
+    from wms.passwords import hash_password
+    from wms.document_expiry import scan_expiring_documents
+    from wms.asset_analytics import rebuild_usage
+    from wms.task_board import rebuild_counts
+
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    today = now.replace(hour=0, minute=0, second=0)
+    password_hash = hash_password(PASSWORD)
+
+    roles = ['Admin'] + ['Manager' if n % 10 == 1 else 'Employee' for n in range(1, users)]
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'user{n}', 'email': email_for(n), 'password_hash': password_hash, 'role': role,
+         'session_version': 0}
+        for n, role in enumerate(roles)])
+    ids = [user_id for user_id, in db.session.query(User.id).order_by(User.id)]
+    by_role = {}
+    for user_id, role in zip(ids, roles):
+        by_role.setdefault(role, []).append(user_id)
+    managers = by_role['Admin'] + by_role.get('Manager', [])
+
+    db.session.execute(Task.__table__.insert(), [
+        {'title': f'Task {n} for user {user_id}', 'description': 'Synthetic benchmark task',
+         'priority': rng.choice(['Low', 'Medium', 'High']), 'status': rng.choice(['To Do', 'In Progress', 'Done']),
+         'deadline': today + datetime.timedelta(days=rng.randint(-days, days)),
+         'date_posted': now - datetime.timedelta(days=rng.randint(0, days)),
+         'assigned_to_id': user_id, 'assigned_by_id': rng.choice(managers)}
+        for user_id in ids for n in range(tasks_per_user)])
+    # One team-wide task, as a bulk assignment would create it
+    batch_id = db.session.execute(TaskBatch.__table__.insert().values(
+        title='Safety checklist', size=len(ids), date_created=now, created_by_id=ids[0])).inserted_primary_key[0]
+    db.session.execute(Task.__table__.insert(), [
+        {'title': 'Safety checklist', 'description': 'Synthetic team task', 'priority': 'High',
+         'status': ['To Do', 'In Progress', 'Done'][user_id % 3], 'deadline': today + datetime.timedelta(days=days),
+         'date_posted': now, 'assigned_to_id': user_id, 'assigned_by_id': ids[0], 'batch_id': batch_id}
+        for user_id in ids])
+
+    shifts, attendance = [], []
+    for user_id in ids:
+        for day in range(-days, days):
+            start = today + datetime.timedelta(days=day, hours=rng.choice([6, 9, 14]))
+            shifts.append({'user_id': user_id, 'start_time': start, 'end_time': start + datetime.timedelta(hours=8)})
+            if day < 0:
+                clock_in = start + datetime.timedelta(minutes=rng.randint(-10, 15))
+                attendance.append({'user_id': user_id, 'clock_in_time': clock_in,
+                                   'clock_out_time': clock_in + datetime.timedelta(hours=8, minutes=rng.randint(-20, 40))})
+    db.session.execute(Shift.__table__.insert(), shifts)
+    db.session.execute(Attendance.__table__.insert(), attendance)
+
+    leave = []
+    for user_id in ids:
+        for n in range(leave_per_user):
+            start = today.date() + datetime.timedelta(days=rng.randint(-days, days))
+            leave.append({'user_id': user_id, 'start_date': start, 'end_date': start + datetime.timedelta(days=rng.randint(0, 4)),
+                          'reason': 'Synthetic leave', 'status': rng.choice(['Pending', 'Approved', 'Rejected'])})
+    db.session.execute(LeaveRequest.__table__.insert(), leave)
+    db.session.execute(Goal.__table__.insert(), [
+        {'user_id': user_id, 'title': f'Goal {n}', 'description': 'Synthetic goal',
+         'status': rng.choice(['In Progress', 'Completed'])}
+        for user_id in ids for n in range(goals_per_user)])
+    db.session.execute(Evaluation.__table__.insert(), [
+        {'employee_id': user_id, 'author_id': rng.choice(managers), 'content': 'Synthetic evaluation',
+         'rating': rng.randint(1, 5), 'date_created': now - datetime.timedelta(days=rng.randint(0, days))}
+        for user_id in ids])
+
+    messages = []
+    for user_id in ids:
+        partners = rng.sample([other for other in ids if other != user_id], min(contacts, len(ids) - 1))
+        for n in range(messages_per_user):
+            messages.append({'sender_id': user_id, 'recipient_id': rng.choice(partners),
+                             'content': f'Synthetic message {n}', 'read': rng.random() < 0.8,
+                             'date_sent': now - datetime.timedelta(minutes=rng.randint(0, days * 24 * 60))})
+    db.session.execute(Message.__table__.insert(), messages)
+
+    db.session.execute(Document.__table__.insert(), [
+        {'filename': f'doc_{user_id}_{n}.pdf', 'category': rng.choice(['General', 'Payslip', 'Contract']),
+         'upload_date': now - datetime.timedelta(days=rng.randint(0, days)), 'user_id': user_id,
+         'expiry_date': (today + datetime.timedelta(days=rng.randint(-days, 3 * days))).date() if rng.random() < 0.5 else None}
+        for user_id in ids for n in range(documents_per_user)])
+
+    db.session.execute(Announcement.__table__.insert(), [
+        {'title': f'Announcement {n}', 'content': 'Synthetic announcement', 'user_id': rng.choice(managers),
+         'date_posted': now - datetime.timedelta(hours=n * 12)}
+        for n in range(days * 2 if announcements is None else announcements)])
+
+    db.session.execute(Asset.__table__.insert(), [
+        {'name': f'Asset {n}', 'description': 'Synthetic asset', 'status': 'Available'} for n in range(assets)])
+    logs = []
+    for asset_id, in db.session.query(Asset.id):
+        check_out = now - datetime.timedelta(days=days)
+        for _ in range(logs_per_asset):
+            check_out += datetime.timedelta(hours=rng.randint(1, 24))
+            check_in = check_out + datetime.timedelta(hours=rng.randint(1, 8))
+            if check_in >= now:
+                break
+            logs.append({'asset_id': asset_id, 'user_id': rng.choice(ids), 'check_out_time': check_out,
+                         'check_in_time': check_in})
+            check_out = check_in
+    if logs:
+        db.session.execute(AssetLog.__table__.insert(), logs)
+    db.session.commit()
+
+    scan_expiring_documents()
+    rebuild_usage()
+    rebuild_counts()
+    return by_role
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=30)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    from wms import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        by_role = seed(users=args.users, days=args.days)
+    print(', '.join(f'{len(user_ids)} {role}' for role, user_ids in by_role.items()) + f'; password {PASSWORD!r}')
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,308 @@
+"""
+Load test for the main blueprint: scripted scenarios against a seeded
+database, reporting latency percentiles, throughput and SQL statements per
+request, compared with a stored baseline.
+
+Usage: python benchmarks/load_test.py [--target client|gunicorn] [--users 200]
+           [--concurrency 8] [--iterations 40] [--scenario dashboard ...]
+           [--baseline benchmarks/baseline.json] [--save-baseline] [--tolerance 0.25]
+
+Scenarios: login_spike (everyone logging in at once), dashboard (employees
+browsing), messaging (reading and sending messages) and analytics
+(managers' reports). The client target runs the app in-process through the
+Flask test client; the gunicorn target starts one gthread worker on a local
+port and drives it over HTTP. SQL counts come from the app's /metrics
+endpoint, which is why gunicorn runs a single worker.
+
+--save-baseline stores the results; later runs exit non-zero when a
+scenario's p95 latency grows by more than --tolerance or it runs more SQL
+statements per request than the baseline did, and also when there is no
+baseline to compare with. benchmarks/baseline.json holds the reference
+for the default client run; latencies depend on the machine, so re-record
+it (--save-baseline) when moving the benchmark to different hardware.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.dataset import seed, email_for, PASSWORD  # noqa: E402
+
+METRICS_TOKEN = 'load-test'
+
+
+def bench_app():
+    """App factory for the gunicorn target (CSRF off so scripted POSTs work)."""
+    from wms import create_app
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    return app
+
+
+class ClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, headers=None):
+        response = self.client.open(path, method=method, data=data, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+                                                  _NoRedirect())
+
+    def request(self, method, path, data=None, headers=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with self.opener.open(req) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def timed(self, session, method, path, data=None):
+        started = time.perf_counter()
+        status, _ = session.request(method, path, data)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.latencies.append(elapsed)
+            if status >= 400:
+                self.errors += 1
+        return status
+
+
+def login(session, user_id):
+    status, _ = session.request('POST', '/login', {'email': email_for(user_id - 1), 'password': PASSWORD})
+    if status != 302:
+        raise RuntimeError(f'login failed for user {user_id}: HTTP {status}')
+
+
+def login_spike(session, recorder, user_id, rng, context):
+    recorder.timed(session, 'POST', '/login', {'email': email_for(user_id - 1), 'password': PASSWORD})
+    session.request('GET', '/logout')
+
+
+def dashboard(session, recorder, user_id, rng, context):
+    for path in ('/', '/announcements', '/my_payslips'):
+        recorder.timed(session, 'GET', path)
+
+
+def messaging(session, recorder, user_id, rng, context):
+    partner = rng.choice(context['all_ids'])
+    recorder.timed(session, 'GET', '/messages')
+    recorder.timed(session, 'GET', f'/conversation/{partner}')
+    recorder.timed(session, 'POST', f'/conversation/{partner}', {'content': 'Load test message'})
+
+
+def analytics(session, recorder, user_id, rng, context):
+    for path in ('/analytics', '/leave/requests', '/documents'):
+        recorder.timed(session, 'GET', path)
+
+
+# name -> (role of the virtual users, one iteration, whether users log in first)
+SCENARIOS = {
+    'login_spike': ('Employee', login_spike, False),
+    'dashboard': ('Employee', dashboard, True),
+    'messaging': ('Employee', messaging, True),
+    'analytics': ('Manager', analytics, True),
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1)]
+
+
+def sql_totals(make_session):
+    """(statements, requests) so far, summed over every endpoint except /metrics itself."""
+    _, body = make_session().request('GET', '/metrics', headers={'Authorization': f'Bearer {METRICS_TOKEN}'})
+    totals = {'sum': 0.0, 'count': 0.0}
+    for kind, endpoint, value in re.findall(r'^wms_request_sql_statements_(sum|count)\{endpoint="([^"]*)"[^}]*\} (\S+)$',
+                                            body.decode(), re.M):
+        if endpoint != 'main.metrics':
+            totals[kind] += float(value)
+    return totals['sum'], totals['count']
+
+
+def run_scenario(name, make_session, by_role, concurrency, iterations, seed_value):
+    role, iteration, needs_login = SCENARIOS[name]
+    user_ids = by_role[role]
+    context = {'all_ids': [user_id for ids in by_role.values() for user_id in ids]}
+    recorder = Recorder()
+    sessions = []
+    for n in range(concurrency):
+        session = make_session()
+        if needs_login:
+            login(session, user_ids[n % len(user_ids)])
+        sessions.append(session)
+
+    statements_before, requests_before = sql_totals(make_session)
+    barrier = threading.Barrier(concurrency)
+
+    def worker(n):
+        rng = random.Random(seed_value + n)
+        barrier.wait()
+        for i in range(n, iterations, concurrency):
+            iteration(sessions[n], recorder, user_ids[i % len(user_ids)], rng, context)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    statements_after, requests_after = sql_totals(make_session)
+
+    latencies = recorder.latencies
+    requests = requests_after - requests_before
+    return {
+        'requests': len(latencies),
+        'errors': recorder.errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'sql_per_request': round((statements_after - statements_before) / requests, 2) if requests else 0.0,
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(env, concurrency):
+    port = _free_port()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', '1', '--threads', str(concurrency),
+                                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+                                'benchmarks.load_test:bench_app()'],
+                               cwd=ROOT, env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            HttpSession(base_url).request('GET', '/login')
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            regressions.append(f"{name}: no baseline recorded")
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms")
+        if result['sql_per_request'] > before['sql_per_request'] + 0.5:
+            regressions.append(f"{name}: SQL/request {before['sql_per_request']} -> {result['sql_per_request']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', choices=['client', 'gunicorn'], default='client')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=40)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS))
+    parser.add_argument('--baseline', default=os.path.join(ROOT, 'benchmarks', 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'load.db')}", METRICS_TOKEN=METRICS_TOKEN,
+               PASSWORD_HASH_QUEUE=str(args.concurrency))
+    os.environ.update(env)
+
+    from wms import db
+    app = bench_app()
+    with app.app_context():
+        db.create_all()
+        by_role = seed(users=args.users, days=args.days, seed=args.seed)
+
+    process = None
+    if args.target == 'gunicorn':
+        process, base_url = start_gunicorn(env, args.concurrency)
+        make_session = lambda: HttpSession(base_url)  # noqa: E731
+    else:
+        make_session = lambda: ClientSession(app)  # noqa: E731
+
+    results = {}
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            results[name] = run_scenario(name, make_session, by_role, args.concurrency, args.iterations, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"{args.target}, {args.users} users, concurrency {args.concurrency}, {args.iterations} iterations")
+    print(f"{'scenario':<12} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'SQL/req':>8}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['requests']:>8} {r['errors']:>6} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} "
+              f"{r['throughput_rps']:>8} {r['sql_per_request']:>8}")
+
+    key = f"{args.target}:{args.users}:{args.concurrency}"
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+    if args.save_baseline:
+        stored[key] = dict(stored.get(key, {}), **results)
+        with open(args.baseline, 'w') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline} ({key})")
+        return
+    if key not in stored:
+        sys.exit(f"FAIL: no baseline for {key} in {args.baseline}; run with --save-baseline to record one")
+    regressions = compare(results, stored[key], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions or any(r['errors'] for r in results.values()):
+        sys.exit(1)
+    print("OK: no regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+Measures successful logins per second through the real /login route and
+reports the rate per CPU core, to size PASSWORD_HASH_METHOD and
+PASSWORD_HASH_WORKERS for shift-change login spikes.
+
+Usage: python benchmarks/login_throughput.py [--threads 4] [--seconds 10]
+           [--method scrypt:32768:8:1] [--hash-workers N]
+
+Runs against a throwaway SQLite file. CSRF is disabled for the test client;
+throttling is raised out of the way since every login succeeds anyway.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--method', help='PASSWORD_HASH_METHOD to benchmark (defaults to the app setting)')
+    parser.add_argument('--hash-workers', type=int, help='PASSWORD_HASH_WORKERS (defaults to the app setting)')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'logins.db')}"
+    if args.method:
+        os.environ['PASSWORD_HASH_METHOD'] = args.method
+    if args.hash_workers:
+        os.environ['PASSWORD_HASH_WORKERS'] = str(args.hash_workers)
+    os.environ['PASSWORD_HASH_QUEUE'] = str(args.threads)  # never turn benchmark logins away
+    os.environ['LOGIN_MAX_ATTEMPTS'] = str(10 ** 9)
+
+    from wms import create_app, db
+    from wms.models import User
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        for i in range(args.threads):
+            user = User(username=f'bench{i}', email=f'bench{i}@example.com')
+            user.set_password('benchmark-password')
+            db.session.add(user)
+        db.session.commit()
+        method = app.config['PASSWORD_HASH_METHOD']
+        hash_workers = app.config['PASSWORD_HASH_WORKERS']
+
+    counts = [0] * args.threads
+    failures = [0] * args.threads
+    deadline = time.monotonic() + args.seconds
+
+    def worker(n):
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            response = client.post('/login', data={'email': f'bench{n}@example.com', 'password': 'benchmark-password'})
+            client.get('/logout')
+            if response.status_code == 302:
+                counts[n] += 1
+            else:
+                failures[n] += 1
+
+    cpu_start = time.process_time()
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    cpu_seconds = time.process_time() - cpu_start
+
+    with app.app_context():
+        db.drop_all()
+
+    logins = sum(counts)
+    cores_used = cpu_seconds / elapsed
+    print(f"method {method}, {hash_workers} hash workers, {args.threads} client threads, {elapsed:.1f}s")
+    print(f"{logins} logins ({sum(failures)} failed): {logins / elapsed:.1f} logins/s")
+    print(f"{cores_used:.2f} cores busy: {logins / cpu_seconds:.1f} logins/s per core" if cpu_seconds else "no CPU time")
+    if sum(failures):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
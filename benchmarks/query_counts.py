@@ -0,0 +1,157 @@
+"""
+Query-count regression check for every route in main_bp.
+
+Seeds the benchmark dataset at a small and a large size, renders every GET
+route of the main blueprint as an anonymous visitor and as each role, and
+fails when a page runs more SQL statements on the larger dataset, which is
+what an N+1 query (a query per user, per partner or per row in a template)
+looks like. For each failure it prints the statements that repeat, as
+fingerprints with literals replaced by "?". A page that answers with a
+server error fails the check too.
+
+Usage: python benchmarks/query_counts.py [--verbose]
+
+Exits non-zero on any growth not listed in KNOWN_GROWTH. Pages in that
+list are reported but tolerated until they are fixed, and the report says
+when one of them has stopped growing so its entry can be removed.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.dataset import seed, email_for, PASSWORD  # noqa: E402
+
+# Both sizes have more announcements than fit on one page of the feed
+SMALL = dict(users=12, days=4, tasks_per_user=3, messages_per_user=6, contacts=2, documents_per_user=1,
+             leave_per_user=1, goals_per_user=1, announcements=25, assets=3, logs_per_asset=3)
+LARGE = dict(users=48, days=12, tasks_per_user=9, messages_per_user=18, contacts=6, documents_per_user=3,
+             leave_per_user=3, goals_per_user=3, announcements=75, assets=9, logs_per_asset=9)
+
+ROLES = ('anonymous', 'Employee', 'Manager', 'Admin')
+
+# Routes that aren't rendered: they log the client out or need arguments that can't be seeded
+SKIPPED = {'main.logout', 'main.download_profile'}
+
+# (endpoint, role) pairs whose statement count is known to grow with the data; none at the moment
+KNOWN_GROWTH = set()
+
+
+def fingerprint(statement):
+    statement = ' '.join(statement.split())
+    statement = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    statement = re.sub(r'\b\d+(?:\.\d+)?\b', '?', statement)
+    return re.sub(r'\((?:\?, )+\?\)', '(?)', statement)
+
+
+class StatementLog:
+    def __init__(self):
+        self.statements = None
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.statements is not None:
+            self.statements.append(statement)
+
+
+def url_arguments(app, user_id):
+    """Values for the routes' URL arguments, picked from the seeded data."""
+    from wms.models import User, Goal, Asset, TaskBatch
+    with app.app_context():
+        other = User.query.filter(User.id != user_id, User.role == 'Employee').order_by(User.id).first()
+        goal = Goal.query.filter_by(user_id=user_id).order_by(Goal.id).first() if user_id else Goal.query.first()
+        asset = Asset.query.order_by(Asset.id).first()
+        batch = TaskBatch.query.order_by(TaskBatch.id).first()
+        return {'recipient_id': other.id, 'employee_id': other.id, 'user_id': other.id,
+                'goal_id': goal.id, 'asset_id': asset.id, 'batch_id': batch.id}
+
+
+def measure(size):
+    """({(endpoint, role): [statements]}, {(endpoint, role): status}) for every GET route on a fresh database."""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from flask import url_for
+    from wms import create_app, db
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'counts.db')}"
+    os.environ['DASHBOARD_CACHE_BACKEND'] = 'none'  # count what the home page costs to build
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        by_role = seed(**size)
+
+    log = StatementLog()
+    event.listen(Engine, 'before_cursor_execute', log)
+    results, statuses = {}, {}
+    try:
+        rules = [rule for rule in app.url_map.iter_rules()
+                 if rule.endpoint.startswith('main.') and 'GET' in rule.methods and rule.endpoint not in SKIPPED]
+        for role in ROLES:
+            client = app.test_client()
+            user_id = None
+            if role != 'anonymous':
+                user_id = by_role[role][-1]
+                response = client.post('/login', data={'email': email_for(user_id - 1), 'password': PASSWORD})
+                assert response.status_code == 302, f'login as {role} failed'
+            arguments = url_arguments(app, user_id)
+            for rule in sorted(rules, key=lambda rule: rule.rule):
+                with app.test_request_context():
+                    path = url_for(rule.endpoint, **{name: arguments[name] for name in rule.arguments})
+                log.statements = []
+                statuses[(rule.endpoint, role)] = client.get(path).status_code
+                results[(rule.endpoint, role)] = log.statements
+                log.statements = None
+    finally:
+        event.remove(Engine, 'before_cursor_execute', log)
+        with app.app_context():
+            db.drop_all()
+    return results, statuses
+
+
+def repeated(statements):
+    counts = Counter(fingerprint(statement) for statement in statements)
+    return [(count, statement) for statement, count in counts.most_common() if count > 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--verbose', action='store_true', help='print the count for every page')
+    args = parser.parse_args()
+
+    (small, small_statuses), (large, large_statuses) = measure(SMALL), measure(LARGE)
+    errors = sorted(key for key in large if small_statuses[key] >= 500 or large_statuses[key] >= 500)
+    failures, fixed = [], []
+    for key in sorted(large):
+        before, after = len(small[key]), len(large[key])
+        grows = after > before
+        if args.verbose or grows:
+            endpoint, role = key
+            marker = 'GROWS' if grows else 'ok'
+            print(f"{marker:<6} {endpoint:<28} {role:<10} {before:>4} -> {after:>4} statements")
+        if grows and key not in KNOWN_GROWTH:
+            failures.append(key)
+        if not grows and key in KNOWN_GROWTH:
+            fixed.append(key)
+
+    for key in failures:
+        print(f"\n{key[0]} as {key[1]}: {len(small[key])} -> {len(large[key])} statements; repeated on the large dataset:")
+        for count, statement in repeated(large[key])[:5]:
+            print(f"  {count:>4} x {statement[:300]}")
+    for endpoint, role in errors:
+        print(f"\n{endpoint} as {role}: HTTP {small_statuses[(endpoint, role)]} / {large_statuses[(endpoint, role)]}")
+    for endpoint, role in fixed:
+        print(f"\nnote: {endpoint} as {role} no longer grows; it can be removed from KNOWN_GROWTH")
+
+    if failures or errors:
+        sys.exit(1)
+    print(f"\nOK: {len(large)} page renders, no statement count grows with the data"
+          + (f" ({len(KNOWN_GROWTH)} known exceptions)" if KNOWN_GROWTH else ''))
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -11,6 +11,7 @@ def make_admin(email):
         user = User.query.filter_by(email=email).first()
         if user:
             user.role = 'Admin'
+            user.revoke_sessions()
             db.session.commit()
             print(f"Success: User '{email}' has been promoted to Admin.")
         else:
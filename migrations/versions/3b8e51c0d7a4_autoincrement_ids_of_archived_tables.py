@@ -0,0 +1,48 @@
+"""autoincrement ids of tables that are archived
+
+Revision ID: 3b8e51c0d7a4
+Revises: 6aff2578ce74
+Create Date: 2026-10-19 15:02:11.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e51c0d7a4'
+down_revision = '6aff2578ce74'
+branch_labels = None
+depends_on = None
+
+# Live table -> the archive its rows move to, keeping their ids
+TABLES = {
+    'attendance': 'archived_attendance',
+    'kiosk_punch': 'archived_kiosk_punch',
+    'message': 'archived_message',
+    'asset_log': 'archived_asset_log',
+}
+
+
+def upgrade():
+    # Only SQLite reuses the id of a deleted row; elsewhere ids come from sequences
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table, archive in TABLES.items():
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        # Continue numbering after every id already handed out, archived ones included
+        op.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) SELECT :name, 0 "
+                           "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)").
+                   bindparams(name=table))
+        op.execute(sa.text(f"UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT COALESCE(MAX(id), 0) FROM {table}), "
+                           f"(SELECT COALESCE(MAX(id), 0) FROM {archive})) WHERE name = :name").
+                   bindparams(name=table))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
@@ -0,0 +1,27 @@
+"""Add lower(username) and lower(email) indexes for the user picker
+
+Revision ID: 5b1f0c8e2d47
+Revises: e77635091c7e
+Create Date: 2026-10-19 14:02:11.408215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1f0c8e2d47'
+down_revision = 'e77635091c7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Expression indexes aren't picked up by autogenerate
+    op.create_index('ix_user_username_lower', 'user', [sa.text('lower(username)')], unique=False)
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user')
+    op.drop_index('ix_user_username_lower', table_name='user')
@@ -4,8 +4,9 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from flask_migrate import Migrate # Import Flask-Migrate
+from wms.database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 csrf = CSRFProtect()
 migrate = Migrate() # Initialize Migrate
@@ -19,10 +20,140 @@ def create_app():
     # Use environment variable for PostgreSQL in production, fallback to SQLite for local dev
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///wms.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Optional read replica, registered as the 'replica' bind
+    app.config['DATABASE_REPLICA_URL'] = os.environ.get('DATABASE_REPLICA_URL')
+    # After a write, that browser session reads from the primary for this long to hide replica lag
+    app.config['DATABASE_REPLICA_STICKY_SECONDS'] = float(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 10))
+    # Connection pool for server databases (ignored for SQLite)
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+    # Server-side limit on a single statement (PostgreSQL), 0 for none
+    app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    # PRAGMAs applied to every SQLite connection; empty journal mode/synchronous leaves SQLite's default
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
     
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static/uploads')
 
+    # Comma-separated shared tokens for badge-reader kiosks; the punch API is closed when empty
+    app.config['KIOSK_API_TOKENS'] = [t for t in os.environ.get('KIOSK_API_TOKENS', '').split(',') if t]
+    app.config['KIOSK_MAX_BATCH'] = int(os.environ.get('KIOSK_MAX_BATCH', 500))
+    # How far ahead of the server's clock (seconds) a kiosk punch may be before it is rejected
+    app.config['KIOSK_MAX_SKEW'] = float(os.environ.get('KIOSK_MAX_SKEW', 300))
+
+    # Documents expiring within this many days are flagged on dashboards
+    app.config['DOCUMENT_EXPIRY_WINDOW_DAYS'] = int(os.environ.get('DOCUMENT_EXPIRY_WINDOW_DAYS', 30))
+
+    app.config['ANNOUNCEMENTS_PER_PAGE'] = int(os.environ.get('ANNOUNCEMENTS_PER_PAGE', 20))
+
+    # Bearer token for scraping /metrics; the endpoint is closed when empty
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')
+    app.config['METRICS_SLOWEST_STATEMENTS'] = int(os.environ.get('METRICS_SLOWEST_STATEMENTS', 20))
+    # Statements at least this slow are logged on the wms.sql logger
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+
+    # Opt-in request profiler (see wms/profiler.py); profiles are kept in a bounded directory
+    app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED') == '1'
+    app.config['PROFILER_SAMPLE_RATE'] = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    app.config['PROFILER_THRESHOLD_MS'] = float(os.environ.get('PROFILER_THRESHOLD_MS', 0))
+    app.config['PROFILER_INTERVAL_MS'] = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+    app.config['PROFILER_TOKEN_MAX_AGE'] = int(os.environ.get('PROFILER_TOKEN_MAX_AGE', 3600))
+    app.config['PROFILER_MAX_PROFILES'] = int(os.environ.get('PROFILER_MAX_PROFILES', 200))
+    app.config['PROFILER_DIR'] = os.environ.get('PROFILER_DIR', os.path.join(app.instance_path, 'profiles'))
+
+    app.config['USER_SEARCH_MAX_RESULTS'] = int(os.environ.get('USER_SEARCH_MAX_RESULTS', 20))
+    # Task board: cards per column page, tasks per bulk move, tasks listed on the home page
+    app.config['TASK_BOARD_PAGE_SIZE'] = int(os.environ.get('TASK_BOARD_PAGE_SIZE', 20))
+    app.config['TASK_BOARD_MAX_BULK'] = int(os.environ.get('TASK_BOARD_MAX_BULK', 200))
+    app.config['HOME_TASK_LIMIT'] = int(os.environ.get('HOME_TASK_LIMIT', 50))
+    # Deadline reminders (flask run-reminders): how long before the deadline, how far ahead the
+    # scheduler loads, how often it checks for new tasks, and reminders per INSERT
+    app.config['TASK_REMINDER_LEAD_MINUTES'] = int(os.environ.get('TASK_REMINDER_LEAD_MINUTES', 24 * 60))
+    app.config['TASK_REMINDER_HORIZON_MINUTES'] = int(os.environ.get('TASK_REMINDER_HORIZON_MINUTES', 60))
+    app.config['TASK_REMINDER_POLL_SECONDS'] = float(os.environ.get('TASK_REMINDER_POLL_SECONDS', 30))
+    app.config['TASK_REMINDER_BATCH_SIZE'] = int(os.environ.get('TASK_REMINDER_BATCH_SIZE', 500))
+    # Largest team a single bulk assignment may target
+    app.config['TASK_BULK_MAX_ASSIGNEES'] = int(os.environ.get('TASK_BULK_MAX_ASSIGNEES', 5000))
+
+    # Notification outbox (flask run-notifications): channels every notification goes out on,
+    # entries per batch, how long a worker holds a batch, retries and their backoff
+    app.config['NOTIFICATION_CHANNELS'] = os.environ.get('NOTIFICATION_CHANNELS', 'inapp')
+    app.config['NOTIFICATION_BATCH_SIZE'] = int(os.environ.get('NOTIFICATION_BATCH_SIZE', 200))
+    app.config['NOTIFICATION_LEASE_SECONDS'] = int(os.environ.get('NOTIFICATION_LEASE_SECONDS', 300))
+    app.config['NOTIFICATION_MAX_ATTEMPTS'] = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 8))
+    app.config['NOTIFICATION_RETRY_BASE_SECONDS'] = float(os.environ.get('NOTIFICATION_RETRY_BASE_SECONDS', 30))
+    app.config['NOTIFICATION_RETRY_MAX_SECONDS'] = float(os.environ.get('NOTIFICATION_RETRY_MAX_SECONDS', 6 * 3600))
+    app.config['NOTIFICATION_POLL_SECONDS'] = float(os.environ.get('NOTIFICATION_POLL_SECONDS', 5))
+    # Prefix for links in emails, e.g. https://wms.example.com
+    app.config['NOTIFICATION_BASE_URL'] = os.environ.get('NOTIFICATION_BASE_URL', 'http://localhost:5000')
+    app.config['NOTIFICATIONS_PER_PAGE'] = int(os.environ.get('NOTIFICATIONS_PER_PAGE', 20))
+    # SMTP server for the email channel; the default is a local debug server
+    app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'localhost')
+    app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 8025))
+    app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', '').lower() in ('1', 'true', 'yes')
+    app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', '')
+    app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', '')
+    app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'wms@localhost')
+    app.config['MAIL_TIMEOUT'] = float(os.environ.get('MAIL_TIMEOUT', 10))
+
+    # Response compression (brotli when the package is installed, else gzip) and weak ETags with 304s
+    # for GET; routes can override these with @response_options (see wms.compression)
+    app.config['COMPRESSION_ENABLED'] = os.environ.get('COMPRESSION_ENABLED', '1') == '1'
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    app.config['COMPRESSION_MIMETYPES'] = os.environ.get(
+        'COMPRESSION_MIMETYPES',
+        'text/html,text/css,text/plain,text/javascript,application/javascript,application/json,image/svg+xml')
+    app.config['COMPRESSION_GZIP_LEVEL'] = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+    app.config['COMPRESSION_STATIC_CACHE_SIZE'] = int(os.environ.get('COMPRESSION_STATIC_CACHE_SIZE', 256))
+    app.config['ETAGS_ENABLED'] = os.environ.get('ETAGS_ENABLED', '1') == '1'
+
+    # Rows per page on the Admin audit log
+    app.config['AUDIT_EVENTS_PER_PAGE'] = int(os.environ.get('AUDIT_EVENTS_PER_PAGE', 50))
+
+    # History older than these many days moves to the archive tables with `flask archive-history`
+    app.config['ARCHIVE_ATTENDANCE_DAYS'] = int(os.environ.get('ARCHIVE_ATTENDANCE_DAYS', 365))
+    app.config['ARCHIVE_MESSAGE_DAYS'] = int(os.environ.get('ARCHIVE_MESSAGE_DAYS', 365))
+    app.config['ARCHIVE_ASSET_LOG_DAYS'] = int(os.environ.get('ARCHIVE_ASSET_LOG_DAYS', 730))
+    app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', 1000))
+
+    # Cached home page sections: 'filesystem' (shared by the workers on a host), 'redis', 'memory' (per
+    # process, only safe with a single worker) or 'none' (see wms.dashboard_cache)
+    app.config['DASHBOARD_CACHE_BACKEND'] = os.environ.get('DASHBOARD_CACHE_BACKEND', 'filesystem')
+    app.config['DASHBOARD_CACHE_TTL'] = float(os.environ.get('DASHBOARD_CACHE_TTL', 300))
+    app.config['DASHBOARD_CACHE_SIZE'] = int(os.environ.get('DASHBOARD_CACHE_SIZE', 8192))
+    app.config['DASHBOARD_CACHE_DIR'] = os.environ.get('DASHBOARD_CACHE_DIR', os.path.join(app.instance_path, 'dashboard_cache'))
+    app.config['DASHBOARD_CACHE_REDIS_URL'] = os.environ.get('DASHBOARD_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Per-process cache of the logged-in user; other workers see changes after USER_CACHE_TTL seconds
+    app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 30))
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 4096))
+
+    # Werkzeug hash method with explicit cost parameters; older hashes are upgraded on login
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Concurrent password verifications per process, and how many more may wait before logins get a 503
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+    # Failed logins allowed per email within the window (seconds) before refusing
+    app.config['LOGIN_MAX_ATTEMPTS'] = int(os.environ.get('LOGIN_MAX_ATTEMPTS', 5))
+    # Failed logins allowed per address; much higher, since a plant NAT or kiosk proxy puts many workers behind one
+    app.config['LOGIN_MAX_ATTEMPTS_PER_ADDRESS'] = int(os.environ.get('LOGIN_MAX_ATTEMPTS_PER_ADDRESS', 100))
+    app.config['LOGIN_THROTTLE_WINDOW'] = float(os.environ.get('LOGIN_THROTTLE_WINDOW', 300))
+
+    from wms.database import configure_engines, init_engines, init_replica_routing
+    configure_engines(app)
     db.init_app(app)
+    init_engines(app)
+    init_replica_routing(app)
+
+    from wms import metrics, profiler
+    metrics.init_app(app)
+    profiler.init_app(app)
     login_manager.init_app(app)
     csrf.init_app(app)
     migrate.init_app(app, db) # Initialize Migrate with app and db
@@ -33,13 +164,41 @@ def create_app():
     from wms.routes import main_bp
     app.register_blueprint(main_bp)
 
+    from wms.permissions import Permission
+    app.jinja_env.globals['Permission'] = Permission
+
+    from wms.commands import register_commands
+    register_commands(app)
+
     with app.app_context():
         from . import models
         # db.create_all() # No longer call create_all directly, use Flask-Migrate
 
+    from . import user_cache
+    user_cache.init_app(app)
+
+    from . import dashboard_cache
+    dashboard_cache.init_app(app)
+
+    from . import audit
+    audit.init_app(app)
+
+    from . import passwords
+    passwords.init_app(app)
+
+    from . import static_assets
+    static_assets.init_app(app)
+
+    from . import compression
+    compression.init_app(app)
+
     @login_manager.user_loader
     def load_user(user_id):
-        from .models import User
-        return User.query.get(int(user_id))
+        # Sessions created before session versions existed carry a bare id
+        user_id, _, version = user_id.partition(':')
+        user = user_cache.load_session_user(int(user_id))
+        if user is not None and user.session_version != int(version or 0):
+            return None  # session was revoked
+        return user
 
     return app
\ No newline at end of file
@@ -0,0 +1,53 @@
+import hashlib
+import time
+
+from flask import current_app, session
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import func
+
+from wms import db
+from wms.cache import LRUCache
+from wms.models import Announcement
+
+# Rendered card bodies keyed by (announcement id, date posted). Announcements
+# can't be edited, but SQLite hands a deleted announcement's id to the next
+# one posted, so the id alone doesn't name one announcement; with the posting
+# time in the key, other workers never serve a deleted card for its
+# successor. Evicting on delete just frees the memory in this worker.
+_fragments = LRUCache(maxsize=2048)
+
+
+def render_announcement(announcement):
+    key = (announcement.id, announcement.date_posted)
+    html = _fragments.get(key)
+    if html is None:
+        # Rendered straight from the Jinja environment: fragments are shared by
+        # every user, so they must not run the per-user context processors.
+        html = Markup(current_app.jinja_env.get_template('_announcement.html').render(announcement=announcement))
+        _fragments.set(key, html)
+    return html
+
+
+def forget_announcement(announcement):
+    _fragments.delete((announcement.id, announcement.date_posted))
+
+
+def feed_etag(cursor, *extra):
+    """ETag for one page of the feed as seen by the current user, or None if it can't be cached.
+
+    Combines the feed's state (row count, which every delete changes, and the
+    latest posting time, which every post moves forward even when it reuses a
+    deleted announcement's id) with the user-specific parts of the page;
+    callers pass anything else the page shows (such as unread counters) as
+    ``extra``. The CSRF token embedded in the page is only reused for half its lifetime.
+    """
+    if session.get('_flashes'):
+        return None  # a pending flash message must be rendered, not skipped
+    count, newest = db.session.query(func.count(Announcement.id), func.max(Announcement.date_posted)).one()
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    csrf_bucket = int(time.time() // (time_limit / 2)) if time_limit else 0
+    picture = current_user.profile_picture.filename if current_user.profile_picture else ''
+    state = ':'.join(str(part) for part in (count, newest, cursor, current_user.id, current_user.role, picture,
+                                            csrf_bucket) + extra)
+    return hashlib.sha1(state.encode()).hexdigest()
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Announcement read tracking.
+
+Instead of one row per (user, announcement), each user has a high-water
+mark in feed order (date_posted, id): everything at or before it has been
+read. Announcements read out of order above the mark are kept as a small
+exception set that is folded back into the mark once the gap below them is
+read, so storage stays at roughly one row per user.
+"""
+import datetime
+
+from sqlalchemy import and_, or_, func, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from wms import db
+from wms.models import User, Announcement, AnnouncementRead, AnnouncementReadState
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING; others fall back to a savepoint
+_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def _position(announcement):
+    return announcement.date_posted, announcement.id
+
+
+def _after_mark(state):
+    """Filter for announcements above the user's high-water mark."""
+    if state is None or state.read_through_id is None:
+        return true()
+    return or_(Announcement.date_posted > state.read_through_posted,
+               and_(Announcement.date_posted == state.read_through_posted,
+                    Announcement.id > state.read_through_id))
+
+
+def _is_above(announcement, state):
+    return state.read_through_id is None or \
+        _position(announcement) > (state.read_through_posted, state.read_through_id)
+
+
+def _state_for(user):
+    state = AnnouncementReadState.query.filter_by(user_id=user.id).first()
+    if state is None:
+        # Two requests (say, two tabs) can both get here; insert-or-ignore lets the
+        # second one pick up the first one's row instead of failing on user_id
+        _insert_ignoring_conflicts(AnnouncementReadState.__table__, user_id=user.id)
+        state = AnnouncementReadState.query.filter_by(user_id=user.id).one()
+    return state
+
+
+def _insert_ignoring_conflicts(table, **values):
+    dialect = db.session.get_bind().dialect.name
+    if dialect in _INSERTS:
+        db.session.execute(_INSERTS[dialect](table).values(**values).on_conflict_do_nothing())
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(**values))
+    except IntegrityError:
+        pass
+
+
+def unread_count(user):
+    """Number of announcements the user hasn't read.
+
+    A primary-key lookup for the mark plus an index range count over only
+    the announcements above it, so the cost doesn't grow with feed history.
+    """
+    state = AnnouncementReadState.query.filter_by(user_id=user.id).first()
+    exceptions = select(AnnouncementRead.announcement_id).where(AnnouncementRead.user_id == user.id)
+    return db.session.query(func.count(Announcement.id)).\
+        filter(_after_mark(state), Announcement.id.notin_(exceptions)).scalar()
+
+
+def _compact(state):
+    exceptions = {read.announcement_id: read for read in
+                  AnnouncementRead.query.options(joinedload(AnnouncementRead.announcement)).filter_by(user_id=state.user_id)}
+    if not exceptions:
+        return
+    # Advance the mark over exceptions that now sit directly above it
+    following = Announcement.query.filter(_after_mark(state)).\
+        order_by(Announcement.date_posted.asc(), Announcement.id.asc()).\
+        limit(len(exceptions) + 1).all()
+    for announcement in following:
+        if announcement.id not in exceptions:
+            break
+        state.read_through_posted, state.read_through_id = _position(announcement)
+    for announcement_id, read in exceptions.items():
+        if read.announcement is None or not _is_above(read.announcement, state):
+            db.session.delete(read)
+
+
+def mark_page_read(user, page):
+    """Record that ``user`` has seen ``page``, a newest-first slice of the feed (commits).
+
+    If the page reaches down to the first unread announcement the mark jumps
+    to the top of the page; otherwise the page's unread announcements become
+    exceptions until the gap below them is read.
+    """
+    if not page:
+        return
+    state = _state_for(user)
+    unread = [announcement for announcement in page if _is_above(announcement, state)]
+    if not unread:
+        return
+    first_unread = Announcement.query.filter(_after_mark(state)).\
+        order_by(Announcement.date_posted.asc(), Announcement.id.asc()).first()
+    if first_unread is None or _position(unread[-1]) <= _position(first_unread):
+        state.read_through_posted, state.read_through_id = _position(unread[0])
+    else:
+        known = {read.announcement_id for read in AnnouncementRead.query.filter_by(user_id=user.id)}
+        db.session.add_all(AnnouncementRead(user_id=user.id, announcement_id=announcement.id)
+                           for announcement in unread if announcement.id not in known)
+    state.date_updated = datetime.datetime.utcnow()
+    db.session.flush()
+    _compact(state)
+    db.session.commit()
+
+
+def mark_all_read(user):
+    """Move the user's mark to the newest announcement and drop their exceptions (commits)."""
+    state = _state_for(user)
+    newest = Announcement.query.order_by(Announcement.date_posted.desc(), Announcement.id.desc()).first()
+    if newest is not None:
+        state.read_through_posted, state.read_through_id = _position(newest)
+    AnnouncementRead.query.filter_by(user_id=user.id).delete()
+    state.date_updated = datetime.datetime.utcnow()
+    db.session.commit()
+
+
+def read_stats(announcement_ids):
+    """Return ({announcement_id: readers}, total users) for the given announcements in one query.
+
+    A user has read an announcement if their mark is at or past it or it is
+    in their exception set.
+    """
+    if not announcement_ids:
+        return {}, 0
+    by_mark = select(func.count(AnnouncementReadState.id)).where(
+        or_(AnnouncementReadState.read_through_posted > Announcement.date_posted,
+            and_(AnnouncementReadState.read_through_posted == Announcement.date_posted,
+                 AnnouncementReadState.read_through_id >= Announcement.id))).scalar_subquery()
+    by_exception = select(func.count(AnnouncementRead.id)).\
+        where(AnnouncementRead.announcement_id == Announcement.id).scalar_subquery()
+    total_users = select(func.count(User.id)).scalar_subquery()
+    rows = db.session.query(Announcement.id, by_mark + by_exception, total_users).\
+        filter(Announcement.id.in_(announcement_ids)).all()
+    readers = {announcement_id: count for announcement_id, count, _ in rows}
+    return readers, rows[0][2] if rows else 0
+
+
+def read_state_version():
+    """Changes whenever any user's read state does; lets cached read-rate figures be revalidated."""
+    return db.session.query(func.max(AnnouncementReadState.date_updated)).scalar()
\ No newline at end of file
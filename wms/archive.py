@@ -0,0 +1,131 @@
+"""
+Archiving old history.
+
+Attendance, Message and AssetLog only ever grow. ``flask archive-history``
+moves rows older than their retention period into archive tables with the
+same columns and ids (ArchivedAttendance, ArchivedMessage,
+ArchivedAssetLog), so the live tables, and everything that queries them,
+only carry recent data:
+
+- Attendance: finished shifts that started more than
+  ARCHIVE_ATTENDANCE_DAYS ago, together with their kiosk punches.
+- Message: read messages sent more than ARCHIVE_MESSAGE_DAYS ago.
+- AssetLog: checked-in logs that started more than ARCHIVE_ASSET_LOG_DAYS
+  ago. An asset's open log is never moved.
+
+The live tables are AUTOINCREMENT on SQLite, so an archived row's id is
+never handed out again.
+
+Rows move ARCHIVE_BATCH_SIZE at a time: one INSERT ... SELECT into the
+archive and one DELETE from the live table, committed together, so a run
+can be interrupted at any point and never holds long locks. Batches walk
+the primary key, so rows that can't be archived yet aren't read twice.
+Archived attendance evicts its owners' cached home page sections.
+
+Readers opt in to the archive: ``with_archive(Attendance)`` is an entity
+over the live rows UNION ALL the archived ones, with the same columns,
+usable wherever the model is (``db.session.query(history).filter(
+history.user_id == ...)``). Reports that need all of history (hours
+worked, the asset usage rollup, an asset's full log) use it; everything
+else keeps reading the live table only.
+"""
+import datetime
+
+from flask import current_app
+from sqlalchemy import delete, exists, insert, select, union_all
+from sqlalchemy.orm import aliased
+
+from wms import db, dashboard_cache
+from wms.models import (Attendance, KioskPunch, Message, Asset, AssetLog,
+                        ArchivedAttendance, ArchivedKioskPunch, ArchivedMessage, ArchivedAssetLog)
+
+
+class _Archive:
+    def __init__(self, model, archive, time_column, retention_setting, archivable, dependents=(), dashboard=None):
+        self.model = model
+        self.archive = archive
+        self.time_column = time_column
+        self.retention_setting = retention_setting
+        self.archivable = archivable  # extra condition a row must meet besides its age
+        self.dependents = dependents  # (model, archive model, foreign key column) moved along with each row
+        self.dashboard = dashboard  # (home page section, user id column) of the users whose section shows the rows
+
+
+ARCHIVES = {
+    'attendance': _Archive(Attendance, ArchivedAttendance, Attendance.clock_in_time, 'ARCHIVE_ATTENDANCE_DAYS',
+                           Attendance.clock_out_time.isnot(None),
+                           dependents=[(KioskPunch, ArchivedKioskPunch, KioskPunch.attendance_id)],
+                           dashboard=('attendance', Attendance.user_id)),
+    'message': _Archive(Message, ArchivedMessage, Message.date_sent, 'ARCHIVE_MESSAGE_DAYS',
+                        Message.read.is_(True)),
+    'asset_log': _Archive(AssetLog, ArchivedAssetLog, AssetLog.check_out_time, 'ARCHIVE_ASSET_LOG_DAYS',
+                          AssetLog.check_in_time.isnot(None) & ~exists().where(Asset.open_log_id == AssetLog.id)),
+}
+_BY_MODEL = {spec.model: spec for spec in ARCHIVES.values()}
+
+
+def cutoff(name, now=None):
+    """Rows of ``name`` older than this are archived."""
+    now = now or datetime.datetime.utcnow()
+    return now - datetime.timedelta(days=current_app.config[ARCHIVES[name].retention_setting])
+
+
+def _copy(model, archive, condition):
+    # Same column names on both sides, so the archive copy is a plain INSERT ... SELECT
+    columns = [column.name for column in model.__table__.columns]
+    db.session.execute(insert(archive.__table__).from_select(
+        columns, select(*[model.__table__.c[name] for name in columns]).where(condition)))
+
+
+def archive_batch(name, after_id=0, before=None, batch_size=None):
+    """Archive the next batch of ``name`` rows with ids above ``after_id`` and commit.
+
+    Returns (rows archived, last id examined), or (0, None) when there is
+    nothing left to look at.
+    """
+    spec = ARCHIVES[name]
+    before = before or cutoff(name)
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    owner = [spec.dashboard[1]] if spec.dashboard else []
+    rows = db.session.query(spec.model.id, *owner).\
+        filter(spec.model.id > after_id, spec.time_column < before, spec.archivable).\
+        order_by(spec.model.id).limit(batch_size).all()
+    if not rows:
+        db.session.rollback()
+        return 0, None
+    ids = [row[0] for row in rows]
+    # Copied parents first and deleted parents last, so every foreign key has a row to point at
+    _copy(spec.model, spec.archive, spec.model.id.in_(ids))
+    for model, archive, foreign_key in spec.dependents:
+        _copy(model, archive, foreign_key.in_(ids))
+        db.session.execute(delete(model.__table__).where(foreign_key.in_(ids)))
+    db.session.execute(delete(spec.model.__table__).where(spec.model.id.in_(ids)))
+    if spec.dashboard:
+        # Set-based, so the dashboard cache's flush listener never sees these rows
+        dashboard_cache.invalidate({row[1] for row in rows}, spec.dashboard[0])
+    db.session.commit()
+    return len(ids), ids[-1]
+
+
+def archive_history(names=None, batch_size=None, max_batches=None, now=None):
+    """Archive everything past its retention period; returns {name: rows archived}."""
+    moved = {}
+    for name in names or ARCHIVES:
+        before = cutoff(name, now)
+        moved[name], after_id, batches = 0, 0, 0
+        while max_batches is None or batches < max_batches:
+            count, after_id = archive_batch(name, after_id, before, batch_size)
+            if after_id is None:
+                break
+            moved[name] += count
+            batches += 1
+    return moved
+
+
+def with_archive(model):
+    """An entity for ``model`` that reads the live and the archived rows together."""
+    spec = _BY_MODEL[model]
+    columns = [column.name for column in model.__table__.columns]
+    rows = union_all(select(*[model.__table__.c[name] for name in columns]),
+                     select(*[spec.archive.__table__.c[name] for name in columns]))
+    return aliased(model, rows.subquery(), name=f'{model.__tablename__}_history')
\ No newline at end of file
@@ -0,0 +1,159 @@
+import datetime
+
+from sqlalchemy import func, or_, update
+
+from wms import db
+from wms.archive import with_archive
+from wms.models import User, Asset, AssetLog, AssetUsage
+
+TOP_BORROWERS = 3
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(period_start):
+    if period_start.month == 12:
+        return datetime.date(period_start.year + 1, 1, 1)
+    return datetime.date(period_start.year, period_start.month + 1, 1)
+
+
+def _as_datetime(day):
+    return datetime.datetime.combine(day, datetime.time())
+
+
+def usage_by_month(check_out_time, check_in_time):
+    """Split one checkout into (period_start, checkouts, checkout_seconds, seconds_used) per month it touches.
+
+    The checkout itself (and its full length, for mean-duration figures) is
+    counted in the month it started; the time used is split at month
+    boundaries so utilization never exceeds 100%.
+    """
+    total = (check_in_time - check_out_time).total_seconds()
+    period = month_start(check_out_time)
+    start = check_out_time
+    rows = []
+    while start < check_in_time or not rows:
+        end = min(check_in_time, _as_datetime(next_month(period)))
+        first = not rows
+        rows.append((period, 1 if first else 0, total if first else 0, (end - start).total_seconds()))
+        period, start = next_month(period), end
+    return rows
+
+
+def record_usage(asset_log, check_in_time):
+    """Fold a just-closed checkout into the AssetUsage rollup (no commit)."""
+    for period, checkouts, checkout_seconds, seconds_used in usage_by_month(asset_log.check_out_time, check_in_time):
+        updated = db.session.execute(
+            update(AssetUsage).
+            where(AssetUsage.asset_id == asset_log.asset_id,
+                  AssetUsage.user_id == asset_log.user_id,
+                  AssetUsage.period_start == period).
+            values(checkouts=AssetUsage.checkouts + checkouts,
+                   checkout_seconds=AssetUsage.checkout_seconds + checkout_seconds,
+                   seconds_used=AssetUsage.seconds_used + seconds_used).
+            execution_options(synchronize_session=False)).rowcount
+        if not updated:
+            db.session.add(AssetUsage(asset_id=asset_log.asset_id, user_id=asset_log.user_id, period_start=period,
+                                      checkouts=checkouts, checkout_seconds=checkout_seconds,
+                                      seconds_used=seconds_used))
+
+
+def rebuild_usage(batch_size=1000):
+    """Recompute the whole rollup from the closed asset logs, archived ones included, and commit."""
+    totals = {}
+    logs = with_archive(AssetLog)
+    closed = db.session.query(logs.asset_id, logs.user_id, logs.check_out_time, logs.check_in_time).\
+        filter(logs.check_in_time.isnot(None)).\
+        execution_options(yield_per=batch_size)
+    for asset_id, user_id, check_out_time, check_in_time in closed:
+        for period, checkouts, checkout_seconds, seconds_used in usage_by_month(check_out_time, check_in_time):
+            row = totals.setdefault((asset_id, user_id, period), [0, 0.0, 0.0])
+            row[0] += checkouts
+            row[1] += checkout_seconds
+            row[2] += seconds_used
+
+    AssetUsage.query.delete()
+    if totals:
+        db.session.execute(AssetUsage.__table__.insert(), [
+            {'asset_id': asset_id, 'user_id': user_id, 'period_start': period,
+             'checkouts': checkouts, 'checkout_seconds': checkout_seconds, 'seconds_used': seconds_used}
+            for (asset_id, user_id, period), (checkouts, checkout_seconds, seconds_used) in totals.items()
+        ])
+    db.session.commit()
+    return len(totals)
+
+
+def usage_report(period_start, now=None):
+    """Utilization, checkouts, mean checkout length and top borrowers for every asset in one month.
+
+    Reads the AssetUsage rollup with grouped queries; the rollup only learns
+    of a checkout when it is checked in, so checkouts still open (at most
+    one per asset) are added on the fly: to the month's checkouts if they
+    started in it, and to the hours used, of the asset and of its holder
+    among the top borrowers, for the part that falls in it. The mean
+    checkout length covers closed checkouts only.
+    """
+    now = now or datetime.datetime.utcnow()
+    period_begin = _as_datetime(period_start)
+    period_end = min(_as_datetime(next_month(period_start)), now)
+    period_seconds = max((period_end - period_begin).total_seconds(), 0)
+
+    report = {asset.id: {'asset': asset, 'checkouts': 0, 'open_checkouts': 0, 'checkout_seconds': 0.0,
+                         'seconds_used': 0.0, 'top_borrowers': []}
+              for asset in Asset.query.order_by(Asset.name).all()}
+
+    totals = db.session.query(AssetUsage.asset_id,
+                              func.sum(AssetUsage.checkouts),
+                              func.sum(AssetUsage.checkout_seconds),
+                              func.sum(AssetUsage.seconds_used)).\
+        filter(AssetUsage.period_start == period_start).\
+        group_by(AssetUsage.asset_id)
+    for asset_id, checkouts, checkout_seconds, seconds_used in totals:
+        if asset_id in report:
+            report[asset_id].update(checkouts=checkouts or 0, checkout_seconds=checkout_seconds or 0.0,
+                                    seconds_used=seconds_used or 0.0)
+
+    # Each asset's top borrowers from the rollup, plus its current holder's row so
+    # the open checkout can be added to it below
+    rank = func.row_number().over(partition_by=AssetUsage.asset_id,
+                                  order_by=AssetUsage.seconds_used.desc()).label('rank')
+    ranked = db.session.query(AssetUsage.asset_id, AssetUsage.user_id, AssetUsage.seconds_used, rank).\
+        filter(AssetUsage.period_start == period_start).subquery()
+    borrowers = db.session.query(ranked.c.asset_id, User.username, ranked.c.seconds_used).\
+        join(User, User.id == ranked.c.user_id).\
+        join(Asset, Asset.id == ranked.c.asset_id).\
+        outerjoin(AssetLog, AssetLog.id == Asset.open_log_id).\
+        filter(or_(ranked.c.rank <= TOP_BORROWERS, AssetLog.user_id == ranked.c.user_id)).\
+        order_by(ranked.c.asset_id, ranked.c.rank)
+    seconds_by_borrower = {asset_id: {} for asset_id in report}
+    for asset_id, username, seconds_used in borrowers:
+        if asset_id in report:
+            seconds_by_borrower[asset_id][username] = seconds_used
+
+    open_logs = db.session.query(AssetLog.asset_id, User.username, AssetLog.check_out_time).\
+        join(Asset, Asset.open_log_id == AssetLog.id).\
+        join(User, User.id == AssetLog.user_id)
+    for asset_id, username, check_out_time in open_logs:
+        if asset_id not in report:
+            continue
+        if period_begin <= check_out_time < _as_datetime(next_month(period_start)):
+            report[asset_id]['checkouts'] += 1
+            report[asset_id]['open_checkouts'] += 1
+        overlap = (period_end - max(check_out_time, period_begin)).total_seconds()
+        if overlap > 0:
+            report[asset_id]['seconds_used'] += overlap
+            borrowers_seconds = seconds_by_borrower[asset_id]
+            borrowers_seconds[username] = borrowers_seconds.get(username, 0.0) + overlap
+
+    rows = []
+    for asset_id, row in report.items():
+        ranking = sorted(seconds_by_borrower[asset_id].items(), key=lambda item: -item[1])[:TOP_BORROWERS]
+        row['top_borrowers'] = [(username, seconds_used / 3600) for username, seconds_used in ranking]
+        closed = row['checkouts'] - row['open_checkouts']
+        row['hours_used'] = row['seconds_used'] / 3600
+        row['utilization'] = 100 * row['seconds_used'] / period_seconds if period_seconds else 0.0
+        row['mean_checkout_hours'] = row['checkout_seconds'] / closed / 3600 if closed else 0.0
+        rows.append(row)
+    return rows
\ No newline at end of file
@@ -0,0 +1,79 @@
+import datetime
+
+from sqlalchemy import update
+
+from wms import db, audit
+from wms.models import Asset, AssetLog
+from wms.asset_analytics import record_usage
+from wms.permissions import Permission
+
+
+class AssetTransitionError(Exception):
+    """Raised when a check-out or check-in loses to the asset's current state."""
+
+
+def check_out(asset, user):
+    """Check ``asset`` out to ``user`` and commit.
+
+    The status flip is a conditional UPDATE, so when two people press
+    "Check Out" at the same moment only one statement matches the
+    'Available' row; the loser gets an AssetTransitionError instead of a
+    second open log. The unique partial index on open logs backs this up at
+    the database level.
+    """
+    claimed = db.session.execute(
+        update(Asset).
+        where(Asset.id == asset.id, Asset.status == 'Available').
+        values(status='Checked Out', holder_id=user.id).
+        execution_options(synchronize_session=False)).rowcount
+    if not claimed:
+        db.session.rollback()
+        raise AssetTransitionError('This asset is not available to be checked out.')
+
+    asset_log = AssetLog(user_id=user.id, asset_id=asset.id)
+    db.session.add(asset_log)
+    db.session.flush()
+    db.session.execute(
+        update(Asset).
+        where(Asset.id == asset.id).
+        values(open_log_id=asset_log.id).
+        execution_options(synchronize_session=False))
+    audit.record('asset.checked_out', 'asset', asset.id, before={'status': 'Available', 'holder_id': None},
+                 after={'status': 'Checked Out', 'holder_id': user.id, 'log_id': asset_log.id}, actor=user)
+    db.session.commit()
+    return asset_log
+
+
+def check_in(asset, user):
+    """Close the asset's open log and make it available again, then commit.
+
+    The open log is found through ``Asset.open_log_id`` (a primary-key
+    lookup) instead of searching the asset's whole log history.
+    """
+    asset_log = asset.open_log
+    if asset.status != 'Checked Out' or asset_log is None:
+        raise AssetTransitionError('This asset cannot be checked in.')
+    if asset_log.user_id != user.id and not user.can(Permission.MANAGE_ASSETS):
+        raise AssetTransitionError('You can only check in assets that you have checked out.')
+
+    released = db.session.execute(
+        update(Asset).
+        where(Asset.id == asset.id, Asset.status == 'Checked Out', Asset.open_log_id == asset_log.id).
+        values(status='Available', holder_id=None, open_log_id=None).
+        execution_options(synchronize_session=False)).rowcount
+    if not released:
+        db.session.rollback()
+        raise AssetTransitionError('This asset cannot be checked in.')
+
+    check_in_time = datetime.datetime.utcnow()
+    db.session.execute(
+        update(AssetLog).
+        where(AssetLog.id == asset_log.id, AssetLog.check_in_time.is_(None)).
+        values(check_in_time=check_in_time).
+        execution_options(synchronize_session=False))
+    record_usage(asset_log, check_in_time)
+    audit.record('asset.checked_in', 'asset', asset.id,
+                 before={'status': 'Checked Out', 'holder_id': asset_log.user_id, 'log_id': asset_log.id},
+                 after={'status': 'Available', 'holder_id': None}, actor=user)
+    db.session.commit()
+    return asset_log
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Audit log.
+
+``record()`` notes who did what to which row (role changes, password
+resets, leave decisions, asset check-outs and check-ins) with the state
+before and after. Nothing is written at that point: events are buffered
+on the session and go out as one multi-row INSERT just before the
+transaction commits, so an action costs no extra round trip, and events
+of a rolled-back change are dropped with it.
+
+AuditEvent rows are append-only: the app never updates or deletes them,
+and the ORM refuses to. Admins read them at /admin/audit, newest first,
+filtered by action, target or actor, each filter walking its own index.
+"""
+import datetime
+import json
+
+from flask import has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+from wms import db
+from wms.models import AuditEvent
+from wms.pagination import keyset_page
+
+ACTIONS = ('user.role_changed', 'user.password_reset', 'leave.approved', 'leave.rejected',
+           'asset.checked_out', 'asset.checked_in')
+
+
+class AuditLogImmutable(Exception):
+    """Raised when something tries to change or remove an audit event."""
+
+
+def init_app(app):
+    if not event.contains(db.session, 'before_commit', _flush_buffer):
+        event.listen(db.session, 'before_commit', _flush_buffer)
+        event.listen(db.session, 'after_rollback', _discard_buffer)
+        event.listen(AuditEvent, 'before_update', _refuse_change)
+        event.listen(AuditEvent, 'before_delete', _refuse_change)
+
+
+def _current_actor_id():
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def record(action, target_type, target_id, before=None, after=None, actor=None):
+    """Buffer an audit event; it is written when the current transaction commits.
+
+    ``actor`` defaults to the logged-in user (None outside a request, e.g. in
+    CLI jobs). ``before`` and ``after`` are JSON-friendly dicts of the fields
+    that changed; never pass secrets such as password hashes.
+    """
+    db.session.info.setdefault('audit_buffer', []).append({
+        'action': action,
+        'target_type': target_type,
+        'target_id': target_id,
+        'before': json.dumps(before, sort_keys=True, default=str) if before is not None else None,
+        'after': json.dumps(after, sort_keys=True, default=str) if after is not None else None,
+        'remote_addr': request.remote_addr if has_request_context() else None,
+        'date_created': datetime.datetime.utcnow(),
+        'actor_id': actor.id if actor is not None else _current_actor_id(),
+    })
+
+
+def _flush_buffer(session):
+    events = session.info.pop('audit_buffer', None)
+    if events:
+        session.execute(AuditEvent.__table__.insert(), events)
+
+
+def _discard_buffer(session):
+    session.info.pop('audit_buffer', None)
+
+
+def _refuse_change(mapper, connection, target):
+    raise AuditLogImmutable('Audit events are append-only.')
+
+
+def events(action=None, target_type=None, target_id=None, actor_id=None, cursor=None, per_page=50):
+    """One newest-first page of audit events matching the filters, and the next cursor."""
+    query = AuditEvent.query.options(joinedload(AuditEvent.actor))
+    if action:
+        query = query.filter(AuditEvent.action == action)
+    if target_type:
+        query = query.filter(AuditEvent.target_type == target_type)
+        if target_id is not None:
+            query = query.filter(AuditEvent.target_id == target_id)
+    if actor_id is not None:
+        query = query.filter(AuditEvent.actor_id == actor_id)
+    return keyset_page(query, AuditEvent.date_created, AuditEvent.id, cursor, per_page)
+
+
+def describe(audit_event):
+    """'field: before -> after' for each field the event changed."""
+    before = json.loads(audit_event.before) if audit_event.before else {}
+    after = json.loads(audit_event.after) if audit_event.after else {}
+    return [f"{field}: {before.get(field, '-')} -> {after.get(field, '-')}" for field in sorted(set(before) | set(after))]
\ No newline at end of file
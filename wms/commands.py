@@ -0,0 +1,87 @@
+import click
+
+
+def register_commands(app):
+    # Maintenance jobs, run with `flask --app run.py <command>` (e.g. from cron)
+
+    @app.cli.command('rebuild-asset-usage')
+    def rebuild_asset_usage():
+        """Recompute the monthly asset usage rollup from the asset logs."""
+        from wms.asset_analytics import rebuild_usage
+        rows = rebuild_usage()
+        click.echo(f"Rebuilt asset usage: {rows} rows.")
+
+    @app.cli.command('rebuild-task-counts')
+    def rebuild_task_counts():
+        """Recompute the per-user task status counters from the tasks."""
+        from wms.task_board import rebuild_counts
+        rows = rebuild_counts()
+        click.echo(f"Rebuilt task status counters: {rows} rows.")
+
+    @app.cli.command('run-reminders')
+    @click.option('--once', is_flag=True, help='Send the reminders due now and exit (for cron) instead of running.')
+    def run_reminders(once):
+        """Send task deadline reminders as they come due. Runs until interrupted."""
+        from wms.reminders import ReminderScheduler
+        scheduler = ReminderScheduler()
+        if once:
+            click.echo(f"Sent {scheduler.run_once()} reminders.")
+            return
+        click.echo('Sending task deadline reminders; press Ctrl+C to stop.')
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            pass
+
+    @app.cli.command('run-notifications')
+    @click.option('--once', is_flag=True, help='Deliver one batch and exit instead of running.')
+    def run_notifications(once):
+        """Deliver queued notifications from the outbox. Runs until interrupted."""
+        from wms import notifications
+        if once:
+            click.echo(f"Processed {notifications.deliver_pending()} notifications.")
+            return
+        click.echo('Delivering notifications; press Ctrl+C to stop.')
+        try:
+            notifications.run()
+        except KeyboardInterrupt:
+            pass
+
+    @app.cli.command('archive-history')
+    @click.option('--table', 'tables', multiple=True, type=click.Choice(['attendance', 'message', 'asset_log']),
+                  help='Only archive this table (repeatable; default: all).')
+    @click.option('--batch-size', type=int, default=None, help='Rows per transaction (defaults to ARCHIVE_BATCH_SIZE).')
+    @click.option('--max-batches', type=int, default=None, help='Stop after this many batches per table.')
+    def archive_history(tables, batch_size, max_batches):
+        """Move history past its retention period into the archive tables. Run nightly."""
+        from wms.archive import archive_history
+        moved = archive_history(tables or None, batch_size, max_batches)
+        for name, count in moved.items():
+            click.echo(f"Archived {count} {name} rows.")
+
+    @app.cli.command('vendor-assets')
+    @click.option('--force', is_flag=True, help='Download again even if the file is already there.')
+    def vendor_assets(force):
+        """Download the pinned third-party CSS/JS into static/vendor/ (needs internet access)."""
+        from wms.static_assets import download_vendor
+        fetched = download_vendor(app.static_folder, force)
+        click.echo(f"Downloaded {len(fetched)} vendor files.")
+
+    @app.cli.command('build-assets')
+    def build_assets():
+        """Bundle, minify and fingerprint the static assets into static/dist/. Run on every deploy."""
+        from wms.static_assets import build
+        try:
+            manifest = build(app.static_folder)
+        except FileNotFoundError as e:
+            raise click.ClickException(str(e))
+        for bundle, filename in sorted(manifest.items()):
+            click.echo(f"{bundle} -> dist/{filename}")
+
+    @app.cli.command('scan-document-expiry')
+    @click.option('--days', type=int, default=None, help='Look-ahead window (defaults to DOCUMENT_EXPIRY_WINDOW_DAYS).')
+    def scan_document_expiry(days):
+        """Refresh the queue of documents that expire soon. Run daily."""
+        from wms.document_expiry import scan_expiring_documents
+        due = scan_expiring_documents(days)
+        click.echo(f"{due} documents expire within the window.")
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Response compression and conditional GETs.
+
+Every response passes through ``_finish_response`` (an after_request hook):
+
+- GET/HEAD 200 responses without an ETag of their own get a weak ETag,
+  a hash of the body, and are answered with an empty 304 when the
+  request's If-None-Match already has it. Routes that can tell whether
+  anything changed before rendering (the announcement feed) set their
+  own ETag and keep it.
+- Bodies of COMPRESSION_MIN_SIZE bytes or more whose type is listed in
+  COMPRESSION_MIMETYPES are compressed with brotli when the client
+  accepts it and the ``brotli`` package is installed, otherwise gzip.
+  Static files are compressed too (files served from static/ are
+  otherwise streamed untouched); their compressed bytes are kept in a
+  small per-process LRU keyed by the file's ETag, since they only change
+  on deploy.
+
+Both can be switched off with COMPRESSION_ENABLED / ETAGS_ENABLED, or for
+one route with ``@response_options(compress=False, etag=False,
+min_size=...)`` from wms.decorators.
+
+The ETag is computed on the uncompressed body and is weak, so it names
+the same response whatever the encoding.
+"""
+import gzip
+
+from flask import current_app, g, request
+
+from wms.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+def init_app(app):
+    app.extensions['compression'] = {
+        'static': LRUCache(maxsize=app.config['COMPRESSION_STATIC_CACHE_SIZE']),
+        'mimetypes': {mimetype.strip() for mimetype in app.config['COMPRESSION_MIMETYPES'].split(',') if mimetype.strip()},
+    }
+    app.after_request(_finish_response)
+
+
+def _option(name, config_key):
+    value = g.get('response_options', {}).get(name)
+    return current_app.config[config_key] if value is None else value
+
+
+def _encoding():
+    """The encoding to use for this request, or None if it accepts neither."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding):
+    config = current_app.config
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESSION_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESSION_GZIP_LEVEL'], mtime=0)
+
+
+def _add_etag(response):
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.is_streamed \
+            or response.direct_passthrough or 'ETag' in response.headers or not _option('etag', 'ETAGS_ENABLED'):
+        return response
+    response.add_etag(weak=True)
+    return response.make_conditional(request)
+
+
+def _static_file(response):
+    return response.direct_passthrough and request.endpoint == 'static'
+
+
+def _compressible(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304) \
+            or (response.is_streamed and not _static_file(response)) \
+            or 'Content-Encoding' in response.headers or 'Content-Range' in response.headers:
+        return False
+    if response.mimetype not in current_app.extensions['compression']['mimetypes']:
+        return False
+    return _option('compress', 'COMPRESSION_ENABLED')
+
+
+def _finish_response(response):
+    response = _add_etag(response)
+    if not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding()
+    if encoding is None:
+        return response
+
+    static = _static_file(response)
+    if response.direct_passthrough and not static:
+        return response  # a download streamed from a file
+    min_size = _option('min_size', 'COMPRESSION_MIN_SIZE')
+    if static:
+        if response.content_length is not None and response.content_length < min_size:
+            return response
+        cache = current_app.extensions['compression']['static']
+        key = (request.path, response.headers.get('ETag'), encoding)
+        body = cache.get(key)
+        if body is None:
+            response.direct_passthrough = False
+            body = _compress(response.get_data(), encoding)
+            cache.set(key, body)
+        else:
+            response.response.close()
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        body = _compress(data, encoding)
+    response.direct_passthrough = False
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
\ No newline at end of file
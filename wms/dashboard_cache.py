@@ -0,0 +1,212 @@
+"""
+Per-user cache of the home page's sections.
+
+``home()`` shows five sections (tasks, goals, shifts, recent attendance and
+leave requests). Each is rendered from its own ``_home_*.html`` partial and
+stored, with the counters the page's stat cards need, under
+``dashboard:<section>:<user id>``. Managers' "All Shifts" list is the
+same for all of them and is stored once, under ``dashboard:shifts:all``.
+The clock in/out button's state is not cached: it decides what the next
+click does, so home() reads it from the database every time.
+
+A section is evicted only by writes that can change it, once they are
+committed:
+
+- ORM changes to Task, Goal, Shift, Attendance and LeaveRequest rows are
+  picked up from the session's flushes (so kiosk punches and goal edits
+  need nothing extra).
+- Set-based writes that bypass the ORM (the task board's bulk moves and
+  batch assignment, leave decisions, archiving old attendance) call
+  ``invalidate()`` with the users they touched.
+
+Entries also carry a stamp (the user's permissions; for shifts, whether
+they manage shifts and today's date); an entry whose stamp no longer matches is rebuilt, so a role
+change or midnight never shows the wrong section. DASHBOARD_CACHE_TTL
+bounds how long usernames and pictures shown inside a section can lag.
+
+The backend is chosen with DASHBOARD_CACHE_BACKEND:
+
+- ``filesystem`` (the default): one file per entry in
+  DASHBOARD_CACHE_DIR, shared by every worker on the host.
+- ``memory``: a per-process LRU. Evictions only reach the worker that
+  made the write, so with several workers the others catch up after the
+  TTL; only use it with a single worker.
+- ``redis``: any Redis-protocol server at DASHBOARD_CACHE_REDIS_URL
+  (needs the ``redis`` package).
+- ``none``: no caching.
+"""
+import json
+import os
+import tempfile
+import time
+
+from flask import current_app
+from markupsafe import Markup
+from sqlalchemy import event
+
+from wms import db
+from wms.cache import LRUCache
+from wms.models import Task, Goal, Shift, Attendance, LeaveRequest
+
+SECTIONS = ('tasks', 'goals', 'shifts', 'attendance', 'leave')
+SHARED = 'all'
+
+# Model -> (section, attributes holding the ids of the users whose section shows the row)
+_SOURCES = {
+    Task: ('tasks', ('assigned_to_id', 'assigned_by_id')),
+    Goal: ('goals', ('user_id',)),
+    Shift: ('shifts', ('user_id',)),
+    Attendance: ('attendance', ('user_id',)),
+    LeaveRequest: ('leave', ('user_id',)),
+}
+
+
+class MemoryBackend:
+    def __init__(self, app):
+        self.cache = LRUCache(maxsize=app.config['DASHBOARD_CACHE_SIZE'], ttl=app.config['DASHBOARD_CACHE_TTL'])
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value)
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.cache.delete(key)
+
+
+class FileSystemBackend:
+    def __init__(self, app):
+        self.directory = app.config['DASHBOARD_CACHE_DIR']
+        self.ttl = app.config['DASHBOARD_CACHE_TTL']
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key.replace(':', '-'))
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl and os.path.getmtime(path) < time.time() - self.ttl:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, value):
+        # Written to a temporary file and renamed, so readers never see half an entry
+        fd, temporary = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.replace(temporary, self._path(key))
+
+    def delete_many(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+class RedisBackend:
+    def __init__(self, app):
+        import redis
+        self.client = redis.Redis.from_url(app.config['DASHBOARD_CACHE_REDIS_URL'])
+        self.ttl = int(app.config['DASHBOARD_CACHE_TTL']) or None
+
+    def get(self, key):
+        value = self.client.get(key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(key, value, ex=self.ttl)
+
+    def delete_many(self, keys):
+        if keys:
+            self.client.delete(*keys)
+
+
+BACKENDS = {'memory': MemoryBackend, 'filesystem': FileSystemBackend, 'redis': RedisBackend}
+
+
+def init_app(app):
+    name = app.config['DASHBOARD_CACHE_BACKEND']
+    app.extensions['dashboard_cache'] = BACKENDS[name](app) if name != 'none' else None
+    if not event.contains(db.session, 'after_flush', _collect_stale_sections):
+        event.listen(db.session, 'after_flush', _collect_stale_sections)
+        event.listen(db.session, 'after_commit', _evict_stale_sections)
+        event.listen(db.session, 'after_rollback', _discard_stale_sections)
+
+
+def _backend():
+    return current_app.extensions['dashboard_cache']
+
+
+def _key(section, scope):
+    return f'dashboard:{section}:{scope}'
+
+
+def section(name, scope, stamp, build):
+    """The cached ``name`` section for ``scope`` (a user id, or SHARED), building it on a miss.
+
+    ``build()`` returns a dict with an 'html' string plus any JSON-friendly
+    values the page needs next to it. Returns that dict with 'html' as Markup.
+    """
+    backend = _backend()
+    cached = backend.get(_key(name, scope)) if backend else None
+    entry = json.loads(cached) if cached else None
+    if entry is None or entry['stamp'] != stamp:
+        entry = {'stamp': stamp, 'data': build()}
+        if backend:
+            backend.set(_key(name, scope), json.dumps(entry))
+    data = dict(entry['data'])
+    data['html'] = Markup(data['html'])
+    return data
+
+
+def render_section(template, **context):
+    # Rendered straight from the Jinja environment like the announcement cards: cached
+    # sections must not pick up per-request context (the CSRF token, flashed messages)
+    return current_app.jinja_env.get_template(template).render(**context)
+
+
+def invalidate(user_ids, *sections):
+    """Evict ``sections`` (default: all) of ``user_ids`` once the current transaction commits."""
+    stale = db.session.info.setdefault('stale_dashboard_keys', set())
+    for name in sections or SECTIONS:
+        stale.update(_key(name, user_id) for user_id in user_ids if user_id is not None)
+        if name == 'shifts':
+            stale.add(_key(name, SHARED))
+
+
+def _collect_stale_sections(session, flush_context):
+    stale = session.info.setdefault('stale_dashboard_keys', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        source = _SOURCES.get(type(obj))
+        if source is None:
+            continue
+        name, attributes = source
+        for attribute in attributes:
+            user_id = getattr(obj, attribute)
+            if user_id is not None:
+                stale.add(_key(name, user_id))
+            # The previous owner's section, when a row was reassigned
+            history = db.inspect(obj).attrs[attribute].history
+            stale.update(_key(name, old) for old in history.deleted or () if old is not None)
+        if name == 'shifts':
+            stale.add(_key(name, SHARED))
+
+
+def _evict_stale_sections(session):
+    # Evict only once the change is committed, so a concurrent request can't
+    # cache the old rows between our flush and our commit.
+    keys = session.info.pop('stale_dashboard_keys', None)
+    backend = current_app.extensions.get('dashboard_cache') if current_app else None
+    if keys and backend:
+        backend.delete_many(sorted(keys))
+
+
+def _discard_stale_sections(session):
+    session.info.pop('stale_dashboard_keys', None)
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Engine and connection pool configuration, and read-replica routing.
+
+``configure_engines`` turns the DB_* / SQLITE_* settings into Flask-SQLAlchemy
+engine options before ``db.init_app``; ``init_engines`` then hooks the
+per-connection setup onto the engines it created. Pool settings only apply
+to server databases, SQLite gets PRAGMAs instead so concurrent writers wait
+for the lock rather than failing with "database is locked".
+
+When a replica is configured, ``RoutingSession`` sends the queries of views
+marked ``@read_only`` to it. Everything else stays on the primary: flushes,
+any query after this request has written, anything inside ``use_primary()``,
+and every request from a browser session that made a POST (or other write)
+in the last DATABASE_REPLICA_STICKY_SECONDS, so people always see their own
+changes even if the replica lags.
+"""
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND = 'replica'
+
+
+def engine_options(url, config):
+    """Engine options for the database at ``url``."""
+    dialect = make_url(url).get_backend_name()
+    if dialect == 'sqlite':
+        return {}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if dialect == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def configure_engines(app):
+    config = app.config
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config['SQLALCHEMY_DATABASE_URI'], config)
+    if config['DATABASE_REPLICA_URL']:
+        replica_url = config['DATABASE_REPLICA_URL']
+        config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: dict(engine_options(replica_url, config), url=replica_url)}
+
+
+def init_engines(app):
+    with app.app_context():
+        for engine in app.extensions['sqlalchemy'].engines.values():
+            if engine.dialect.name == 'sqlite':
+                _install_sqlite_pragmas(engine, _sqlite_pragmas(app.config))
+
+
+def _sqlite_pragmas(config):
+    pragmas = {'busy_timeout': config['SQLITE_BUSY_TIMEOUT_MS']}
+    if config['SQLITE_JOURNAL_MODE']:
+        pragmas['journal_mode'] = config['SQLITE_JOURNAL_MODE']
+    if config['SQLITE_SYNCHRONOUS']:
+        pragmas['synchronous'] = config['SQLITE_SYNCHRONOUS']
+    return pragmas
+
+
+def _install_sqlite_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    engine.dispose()  # connections opened before the listener existed lack the PRAGMAs
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _use_replica(self):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+def _use_replica(db_session):
+    if db_session._flushing or db_session.info.get('wrote') or not has_request_context():
+        return False
+    if not g.get('read_only') or g.get('use_primary'):
+        return False
+    return session.get('_primary_until', 0) < time.time()
+
+
+@contextmanager
+def use_primary():
+    """Send this block's queries to the primary, e.g. reads that a write in a read-only view depends on."""
+    previous = g.get('use_primary', False)
+    g.use_primary = True
+    try:
+        yield
+    finally:
+        g.use_primary = previous
+
+
+def init_replica_routing(app):
+    @app.after_request
+    def stick_to_primary(response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and app.config['DATABASE_REPLICA_URL']:
+            session['_primary_until'] = time.time() + app.config['DATABASE_REPLICA_STICKY_SECONDS']
+        return response
\ No newline at end of file
@@ -1,13 +1,59 @@
+import hmac
 from functools import wraps
 from flask_login import current_user
-from flask import abort
+from flask import abort, current_app, g, request
+from .permissions import Permission
+
+def permission_required(*permissions):
+    required = Permission(0)
+    for permission in permissions:
+        required |= permission
 
-def roles_required(*roles):
     def wrapper(f):
         @wraps(f)
         def wrapped_view(*args, **kwargs):
-            if not current_user.is_authenticated or current_user.role not in roles:
+            if not current_user.is_authenticated or current_user.permissions & required != required:
                 abort(403)  # Forbidden
             return f(*args, **kwargs)
         return wrapped_view
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def read_only(f):
+    # Lets the view's queries go to the read replica (see wms.database)
+    @wraps(f)
+    def wrapped_view(*args, **kwargs):
+        g.read_only = True
+        return f(*args, **kwargs)
+    return wrapped_view
+
+def response_options(**options):
+    # Per-route overrides for wms.compression: compress=, etag= (True/False), min_size= (bytes)
+    def wrapper(f):
+        @wraps(f)
+        def wrapped_view(*args, **kwargs):
+            g.response_options = options
+            return f(*args, **kwargs)
+        return wrapped_view
+    return wrapper
+
+def metrics_token_required(f):
+    # Scrapers send "Authorization: Bearer <METRICS_TOKEN>" instead of logging in.
+    @wraps(f)
+    def wrapped_view(*args, **kwargs):
+        expected = current_app.config['METRICS_TOKEN']
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if not expected or scheme.lower() != 'bearer' or not hmac.compare_digest(token, expected):
+            abort(401)  # Unauthorized
+        return f(*args, **kwargs)
+    return wrapped_view
+
+def kiosk_token_required(f):
+    # Kiosks authenticate with a shared token instead of a login session.
+    @wraps(f)
+    def wrapped_view(*args, **kwargs):
+        token = request.headers.get('X-Kiosk-Token', '')
+        tokens = current_app.config['KIOSK_API_TOKENS']
+        if not token or not any(hmac.compare_digest(token, t) for t in tokens):
+            abort(401)  # Unauthorized
+        return f(*args, **kwargs)
+    return wrapped_view
\ No newline at end of file
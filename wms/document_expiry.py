@@ -0,0 +1,59 @@
+import datetime
+
+from flask import current_app
+from sqlalchemy.orm import joinedload
+
+from wms import db
+from wms.models import Document, ExpiringDocument
+from wms.permissions import Permission
+
+
+def expiry_window():
+    return current_app.config['DOCUMENT_EXPIRY_WINDOW_DAYS']
+
+
+def scan_expiring_documents(days=None, today=None):
+    """Rebuild the ExpiringDocument queue and commit; returns the number queued.
+
+    One range query on the indexed ``Document.expiry_date`` finds everything
+    expiring in the next ``days`` days, so the job never reads the rest of
+    the documents table. Meant to run daily from cron.
+    """
+    today = today or datetime.date.today()
+    horizon = today + datetime.timedelta(days=expiry_window() if days is None else days)
+    due = db.session.query(Document.id, Document.user_id, Document.expiry_date).\
+        filter(Document.expiry_date >= today, Document.expiry_date <= horizon).all()
+
+    ExpiringDocument.query.delete()
+    if due:
+        db.session.execute(ExpiringDocument.__table__.insert(), [
+            {'document_id': document_id, 'user_id': user_id, 'expiry_date': expiry_date,
+             'date_computed': datetime.datetime.utcnow()}
+            for document_id, user_id, expiry_date in due
+        ])
+    db.session.commit()
+    return len(due)
+
+
+def track_document(document):
+    """Queue a newly uploaded document right away if it is already due (no commit)."""
+    if not document.expiry_date:
+        return
+    today = datetime.date.today()
+    if today <= document.expiry_date <= today + datetime.timedelta(days=expiry_window()):
+        db.session.add(ExpiringDocument(document=document, user=document.user, expiry_date=document.expiry_date))
+
+
+def expiring_documents_for(user, limit=5):
+    """Return (soonest expiring documents, total due) from the queue.
+
+    Users who manage documents see every employee's documents, everyone else
+    only their own. Entries whose date has passed since the last scan are skipped.
+    """
+    query = ExpiringDocument.query.filter(ExpiringDocument.expiry_date >= datetime.date.today())
+    if not user.can(Permission.MANAGE_DOCUMENTS):
+        query = query.filter_by(user_id=user.id)
+    total = query.count()
+    entries = query.options(joinedload(ExpiringDocument.document).joinedload(Document.user)).\
+        order_by(ExpiringDocument.expiry_date.asc()).limit(limit).all()
+    return [entry.document for entry in entries], total
\ No newline at end of file
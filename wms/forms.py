@@ -1,17 +1,58 @@
+from flask import url_for
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField, SelectField, FloatField
-from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, Optional, NumberRange
-from wtforms_sqlalchemy.fields import QuerySelectField
+from markupsafe import Markup, escape
+from wtforms import Field, StringField, PasswordField, SubmitField, BooleanField, TextAreaField, SelectField, FloatField
+from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, StopValidation, Optional, NumberRange
 from wtforms.fields import DateField, DateTimeField
+from wtforms.utils import unset_value
 from flask_wtf.file import FileField, FileAllowed
+from sqlalchemy import or_
+from wms import db
 from wms.models import User, Asset
-
-def user_query():
-    try:
-        return User.query.all()
-    except Exception as e:
-        print(f"DEBUG: Error in user_query: {str(e)}")
-        return []
+from wms.user_search import user_label
+
+class UserPickerWidget:
+    # A visible search box wired to /api/users/search by static/js/user_picker.js,
+    # plus a hidden input carrying the chosen user's id.
+    def __call__(self, field, **kwargs):
+        kwargs.setdefault('id', field.id)
+        kwargs.setdefault('placeholder', 'Start typing a name or email')
+        attributes = ' '.join(f'{name.replace("_", "-")}="{escape(value)}"' for name, value in kwargs.items())
+        return Markup(
+            f'<input type="hidden" id="{field.id}-id" name="{field.name}" value="{escape(field.data.id if field.data else "")}">'
+            f'<input type="text" name="{field.name}-search" value="{escape(field.search_label)}" list="{field.id}-options" '
+            f'autocomplete="off" data-user-picker="{field.id}-id" data-source="{url_for("main.search_users")}" {attributes}>'
+            f'<datalist id="{field.id}-options"></datalist>')
+
+class UserPickerField(Field):
+    """Chooses one user without rendering every user into the page.
+
+    The submitted id is checked with a single primary-key lookup. Without
+    JavaScript only the search box is filled in, and it must then hold an
+    exact username or email (both uniquely indexed).
+    """
+    widget = UserPickerWidget()
+
+    def process(self, formdata, data=unset_value, extra_filters=None):
+        self.search = formdata.get(f'{self.name}-search', '').strip() if formdata else ''
+        super().process(formdata, data, extra_filters)
+
+    def process_formdata(self, valuelist):
+        raw = valuelist[0].strip() if valuelist else ''
+        if raw.isdigit():
+            self.data = db.session.get(User, int(raw))
+        elif self.search:
+            self.data = User.query.filter(or_(User.username == self.search, User.email == self.search)).first()
+        else:
+            self.data = None
+
+    def pre_validate(self, form):
+        if self.data is None and (self.search or any(self.raw_data or [])):
+            raise StopValidation('Choose a user from the suggestions.')
+
+    @property
+    def search_label(self):
+        return user_label(self.data) if self.data else getattr(self, 'search', '')
 
 class RegistrationForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=2, max=20)])
@@ -42,15 +83,34 @@ class TaskForm(FlaskForm):
     priority = SelectField('Priority', choices=[('Low', 'Low'), ('Medium', 'Medium'), ('High', 'High')],
                            validators=[DataRequired()])
     deadline = DateField('Deadline', format='%Y-%m-%d', validators=[DataRequired()])
-    assigned_to = QuerySelectField('Assign To', query_factory=user_query, get_label='username', allow_blank=False,
-                                   validators=[DataRequired()])
+    assigned_to = UserPickerField('Assign To', validators=[DataRequired()])
     submit = SubmitField('Create Task')
 
+class BulkTaskForm(FlaskForm):
+    title = StringField('Title', validators=[DataRequired(), Length(max=100)])
+    description = TextAreaField('Description', validators=[Optional()])
+    priority = SelectField('Priority', choices=[('Low', 'Low'), ('Medium', 'Medium'), ('High', 'High')],
+                           validators=[DataRequired()])
+    deadline = DateField('Deadline', format='%Y-%m-%d', validators=[DataRequired()])
+    role = SelectField('Everyone with the role', choices=[('', '(nobody)'), ('Employee', 'Employee'),
+                                                          ('Manager', 'Manager'), ('Admin', 'Admin')],
+                       validators=[Optional()])
+    users = TextAreaField('And these users (usernames or emails, one per line or comma-separated)',
+                          validators=[Optional()])
+    submit = SubmitField('Assign Task')
+
+    def identifiers(self):
+        return [part.strip() for part in (self.users.data or '').replace(',', '\n').splitlines() if part.strip()]
+
+class TaskBatchStatusForm(FlaskForm):
+    status = SelectField('Move every task to', choices=[('To Do', 'To Do'), ('In Progress', 'In Progress'), ('Done', 'Done')],
+                         validators=[DataRequired()])
+    submit = SubmitField('Move')
+
 class ShiftForm(FlaskForm):
     start_time = DateTimeField('Start Time', format='%Y-%m-%dT%H:%M', validators=[DataRequired()])
     end_time = DateTimeField('End Time', format='%Y-%m-%dT%H:%M', validators=[DataRequired()])
-    user = QuerySelectField('Employee', query_factory=user_query, get_label='username', allow_blank=False,
-                            validators=[DataRequired()])
+    user = UserPickerField('Employee', validators=[DataRequired()])
     submit = SubmitField('Create Shift')
 
 class LeaveRequestForm(FlaskForm):
@@ -64,12 +124,7 @@ class EmptyForm(FlaskForm):
 
 class DocumentForm(FlaskForm):
     file = FileField('Document', validators=[DataRequired(), FileAllowed(['pdf', 'doc', 'docx', 'jpg', 'png'])])
-    user = QuerySelectField(
-        'Employee',
-        query_factory=user_query,
-        get_label=lambda u: f"{u.username} ({u.email})",   # ← show “username (email)”
-        allow_blank=False,
-        validators=[DataRequired()])
+    user = UserPickerField('Employee', validators=[DataRequired()])
     category = SelectField('Category', choices=[('General', 'General'), ('Payslip', 'Payslip'), ('Contract', 'Contract')],
                            validators=[DataRequired()])
     expiry_date = DateField('Expiry Date (Optional)', format='%Y-%m-%d', validators=[Optional()])
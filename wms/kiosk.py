@@ -0,0 +1,126 @@
+import datetime
+
+from flask import current_app
+from sqlalchemy import func
+
+from wms import db
+from wms.models import User, Attendance, KioskPunch, ArchivedKioskPunch
+
+
+def parse_punch_time(value):
+    """Parse an ISO 8601 timestamp into the naive UTC datetime the models store."""
+    if not isinstance(value, str):
+        raise ValueError('timestamp must be an ISO 8601 string')
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    punch_time = datetime.datetime.fromisoformat(value)
+    if punch_time.tzinfo is not None:
+        punch_time = punch_time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return punch_time
+
+
+def _latest_attendance_by_user(user_ids):
+    # One query for the whole batch instead of one lookup per punch; ties on
+    # clock_in_time go to the newer row, as in clock_in_out().
+    rank = func.row_number().over(partition_by=Attendance.user_id,
+                                  order_by=(Attendance.clock_in_time.desc(), Attendance.id.desc())).label('rank')
+    latest = db.session.query(Attendance.id, rank).filter(Attendance.user_id.in_(user_ids)).subquery()
+    records = Attendance.query.join(latest, Attendance.id == latest.c.id).filter(latest.c.rank == 1).all()
+    return {record.user_id: record for record in records}
+
+
+def record_punches(punches):
+    """Apply a batch of kiosk punches and return one result per punch, in order.
+
+    Every punch is a dict with ``user_id``, ``timestamp`` and ``idempotency_key``
+    and toggles the user's attendance the same way ``clock_in_out()`` does.
+    Keys that were already recorded, archived ones included, report the
+    original outcome instead of punching again, so kiosks can safely resend
+    a batch after a timeout.
+
+    Punches timestamped more than KIOSK_MAX_SKEW seconds in the future are
+    rejected: one would become the user's latest clock-in and every real
+    punch after it would be applied against the wrong row.
+
+    The whole batch costs a fixed handful of queries. New rows are flushed but
+    not committed; the caller commits so the batch lands in one transaction.
+    """
+    results = [None] * len(punches)
+    pending = []
+    latest_allowed = datetime.datetime.utcnow() + datetime.timedelta(seconds=current_app.config['KIOSK_MAX_SKEW'])
+
+    for index, punch in enumerate(punches):
+        if not isinstance(punch, dict):
+            results[index] = {'status': 'rejected', 'error': 'punch must be an object'}
+            continue
+        key = punch.get('idempotency_key')
+        result = {'idempotency_key': key}
+        results[index] = result
+        if not isinstance(key, str) or not 0 < len(key) <= 64:
+            result.update(status='rejected', error='idempotency_key must be a string of 1-64 characters')
+            continue
+        try:
+            user_id = int(punch.get('user_id'))
+            punch_time = parse_punch_time(punch.get('timestamp'))
+        except (TypeError, ValueError) as e:
+            result.update(status='rejected', error=str(e) or 'invalid punch')
+            continue
+        if punch_time > latest_allowed:
+            result.update(status='rejected', error='timestamp is in the future')
+            continue
+        pending.append((punch_time, index, key, user_id))
+
+    if not pending:
+        return results
+
+    keys = {p[2] for p in pending}
+    # Keys of punches moved to the archive (wms.archive) still count as recorded
+    recorded = ArchivedKioskPunch.query.filter(ArchivedKioskPunch.idempotency_key.in_(keys)).all() + \
+        KioskPunch.query.filter(KioskPunch.idempotency_key.in_(keys)).all()
+    seen = {punch.idempotency_key: punch for punch in recorded}
+    user_ids = {p[3] for p in pending}
+    known_users = {row.id for row in db.session.query(User.id).filter(User.id.in_(user_ids))}
+    latest = _latest_attendance_by_user(known_users)
+
+    # Apply punches oldest first so a batch spanning a whole shift toggles correctly.
+    for punch_time, index, key, user_id in sorted(pending):
+        result = results[index]
+        if key in seen:
+            original = seen[key]
+            result.update(status='duplicate', action=original.action, user_id=original.user_id)
+            result['_punch'] = original
+            continue
+        if user_id not in known_users:
+            result.update(status='rejected', error='unknown user')
+            continue
+
+        attendance = latest.get(user_id)
+        if attendance and attendance.clock_out_time is None:
+            if punch_time < attendance.clock_in_time:
+                result.update(status='rejected', error='punch is older than the open clock-in')
+                continue
+            attendance.clock_out_time = punch_time
+            action = 'out'
+        else:
+            if attendance and punch_time < attendance.clock_out_time:
+                result.update(status='rejected', error='punch is older than the last clock-out')
+                continue
+            attendance = Attendance(user_id=user_id, clock_in_time=punch_time)
+            db.session.add(attendance)
+            latest[user_id] = attendance
+            action = 'in'
+
+        kiosk_punch = KioskPunch(idempotency_key=key, punch_time=punch_time, action=action,
+                                 user_id=user_id, attendance=attendance)
+        db.session.add(kiosk_punch)
+        seen[key] = kiosk_punch
+        result.update(status='recorded', action=action, user_id=user_id)
+        result['_punch'] = kiosk_punch
+
+    db.session.flush()
+    for result in results:
+        kiosk_punch = result.pop('_punch', None)
+        if kiosk_punch is not None:
+            result['attendance_id'] = kiosk_punch.attendance_id
+    return results
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+Request and SQL instrumentation.
+
+Flask request hooks time every request, and SQLAlchemy cursor events count
+and time the statements it runs. The totals feed per-endpoint histograms,
+one JSON log line per request on the ``wms.requests`` logger, and a table
+of the slowest statements seen. Statements slower than SLOW_QUERY_MS are
+also logged on ``wms.sql``.
+
+``render_metrics`` exposes it all in the Prometheus text format. Figures
+are kept per process, like the other in-memory caches: under gunicorn a
+scrape reports only the worker that answered it.
+"""
+import json
+import logging
+import re
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+request_log = logging.getLogger('wms.requests')
+sql_log = logging.getLogger('wms.sql')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self, slowest_kept):
+        self.slowest_kept = slowest_kept
+        self.latency = {}
+        self.statements = {}
+        self.sql_seconds = {}
+        self.responses = {}
+        self.slowest = {}
+        self.lock = threading.Lock()
+
+    def record_request(self, endpoint, method, status, seconds, statements, sql_seconds):
+        key = (endpoint, method)
+        with self.lock:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.statements.setdefault(key, Histogram(STATEMENT_BUCKETS)).observe(statements)
+            self.sql_seconds[key] = self.sql_seconds.get(key, 0.0) + sql_seconds
+            status_key = (endpoint, method, str(status))
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def record_statement(self, endpoint, statement, seconds):
+        key = (endpoint, statement)
+        with self.lock:
+            if seconds <= self.slowest.get(key, 0.0):
+                return
+            self.slowest[key] = seconds
+            if len(self.slowest) > 2 * self.slowest_kept:
+                kept = sorted(self.slowest.items(), key=lambda item: item[1], reverse=True)[:self.slowest_kept]
+                self.slowest = dict(kept)
+
+    def slowest_statements(self):
+        with self.lock:
+            return sorted(self.slowest.items(), key=lambda item: item[1], reverse=True)[:self.slowest_kept]
+
+
+def init_app(app):
+    app.extensions['metrics'] = Registry(app.config['METRICS_SLOWEST_STATEMENTS'])
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _discard_failed_statement)
+
+
+def _registry():
+    return current_app.extensions['metrics']
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _start_request():
+    g.metrics = {'started': time.perf_counter(), 'statements': 0, 'sql_seconds': 0.0}
+
+
+def _finish_request(response):
+    stats = g.pop('metrics', None)
+    if stats is None or request.endpoint == 'static':
+        return response
+    seconds = time.perf_counter() - stats['started']
+    _registry().record_request(_endpoint(), request.method, response.status_code, seconds,
+                               stats['statements'], stats['sql_seconds'])
+    if request_log.isEnabledFor(logging.INFO):
+        request_log.info(json.dumps({
+            'endpoint': _endpoint(), 'method': request.method, 'path': request.path,
+            'status': response.status_code, 'duration_ms': round(seconds * 1000, 2),
+            'sql_statements': stats['statements'], 'sql_ms': round(stats['sql_seconds'] * 1000, 2),
+        }))
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['metrics_started'].pop()
+    if not has_request_context() or 'metrics' not in g:
+        return
+    g.metrics['statements'] += 1
+    g.metrics['sql_seconds'] += seconds
+    statement = ' '.join(statement.split())
+    if 'sql_log' in g:
+        g.sql_log.append((seconds * 1000, statement))  # the profiler is capturing this request
+    _registry().record_statement(_endpoint(), statement, seconds)
+    if seconds * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        sql_log.warning(json.dumps({'endpoint': _endpoint(), 'duration_ms': round(seconds * 1000, 2),
+                                    'statement': statement}))
+
+
+def _discard_failed_statement(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('metrics_started'):
+        connection.info['metrics_started'].pop()
+
+
+def _escape(value):
+    return re.sub(r'(["\\])', r'\\\1', str(value)).replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _histogram_lines(name, histograms):
+    for (endpoint, method), histogram in sorted(histograms.items()):
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            yield f"{name}_bucket{_labels(endpoint=endpoint, method=method, le=bound)} {count}"
+        yield f"{name}_bucket{_labels(endpoint=endpoint, method=method, le='+Inf')} {histogram.total}"
+        yield f"{name}_sum{_labels(endpoint=endpoint, method=method)} {histogram.sum}"
+        yield f"{name}_count{_labels(endpoint=endpoint, method=method)} {histogram.total}"
+
+
+def render_metrics():
+    """The current figures in the Prometheus text exposition format."""
+    registry = _registry()
+    with registry.lock:
+        latency = {key: _copy(h) for key, h in registry.latency.items()}
+        statements = {key: _copy(h) for key, h in registry.statements.items()}
+        sql_seconds = dict(registry.sql_seconds)
+        responses = dict(registry.responses)
+    lines = ['# HELP wms_request_duration_seconds Request latency by endpoint.',
+             '# TYPE wms_request_duration_seconds histogram']
+    lines += _histogram_lines('wms_request_duration_seconds', latency)
+    lines += ['# HELP wms_request_sql_statements SQL statements executed per request.',
+              '# TYPE wms_request_sql_statements histogram']
+    lines += _histogram_lines('wms_request_sql_statements', statements)
+    lines += ['# HELP wms_request_sql_seconds_total Time spent executing SQL by endpoint.',
+              '# TYPE wms_request_sql_seconds_total counter']
+    lines += [f"wms_request_sql_seconds_total{_labels(endpoint=e, method=m)} {v}" for (e, m), v in sorted(sql_seconds.items())]
+    lines += ['# HELP wms_requests_total Responses by endpoint and status.',
+              '# TYPE wms_requests_total counter']
+    lines += [f"wms_requests_total{_labels(endpoint=e, method=m, status=s)} {v}" for (e, m, s), v in sorted(responses.items())]
+    lines += ['# HELP wms_slowest_statement_seconds Slowest execution seen of the slowest statements.',
+              '# TYPE wms_slowest_statement_seconds gauge']
+    lines += [f"wms_slowest_statement_seconds{_labels(endpoint=e, statement=s[:500])} {v}"
+              for (e, s), v in registry.slowest_statements()]
+    return '\n'.join(lines) + '\n'
+
+
+def _copy(histogram):
+    copy = Histogram(histogram.buckets)
+    copy.counts, copy.total, copy.sum = list(histogram.counts), histogram.total, histogram.sum
+    return copy
\ No newline at end of file
@@ -1,25 +1,47 @@
 from wms import db
+from flask import current_app
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 import datetime
 from sqlalchemy import Text, Date
+from wms.permissions import Permission, ROLE_PERMISSIONS
 
 
 class User(UserMixin, db.Model):
+    # Case-insensitive prefix search for the user picker (see wms/user_search.py)
+    __table_args__ = (db.Index('ix_user_username_lower', db.text('lower(username)')),
+                      db.Index('ix_user_email_lower', db.text('lower(email)')))
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)
     password_hash = db.Column(db.String(256))
     role = db.Column(db.String(50), nullable=False, default='Employee') # Roles: Admin, Manager, Employee
+    # Bumped to log the user out everywhere, e.g. when their role or password changes
+    session_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # Add relationship to profile picture
     profile_picture = db.relationship('ProfilePicture', backref='user', uselist=False)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    @property
+    def permissions(self):
+        return ROLE_PERMISSIONS.get(self.role, Permission(0))
+
+    def can(self, permission):
+        return self.permissions & permission == permission
+
+    def get_id(self):
+        # Flask-Login stores this in the session and remember-me cookie
+        return f"{self.id}:{self.session_version}"
+
+    def revoke_sessions(self):
+        self.session_version = (self.session_version or 0) + 1
+
     def __repr__(self):
         return f'<User {self.username}>'
 
@@ -36,6 +58,13 @@ class ProfilePicture(db.Model):
 
 
 class Task(db.Model):
+    # Serves one board column: a user's tasks in one status, soonest deadline first
+    __table_args__ = (db.Index('ix_task_assignee_status_deadline', 'assigned_to_id', 'status', 'deadline'),
+                      # Upcoming deadlines still owed a reminder (see wms/reminders.py)
+                      db.Index('ix_task_reminder_due', 'deadline',
+                               sqlite_where=db.text('reminder_sent_at IS NULL'),
+                               postgresql_where=db.text('reminder_sent_at IS NULL')))
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(Text, nullable=True)
@@ -43,17 +72,46 @@ class Task(db.Model):
     deadline = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(20), nullable=False, default='To Do')  # To Do, In Progress, Done
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    reminder_sent_at = db.Column(db.DateTime, nullable=True)
 
     assigned_to_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    assigned_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    assigned_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('task_batch.id'), nullable=True, index=True)
 
     assigned_to = db.relationship('User', foreign_keys=[assigned_to_id], backref='tasks_assigned_to')
     assigned_by = db.relationship('User', foreign_keys=[assigned_by_id], backref='tasks_created_by')
+    batch = db.relationship('TaskBatch')
 
     def __repr__(self):
         return f"Task('{self.title}', '{self.status}')"
 
 
+class TaskBatch(db.Model):
+    # One bulk assignment: the same task given to many people at once
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    date_created = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_by = db.relationship('User')
+
+    def __repr__(self):
+        return f"TaskBatch('{self.title}', {self.size})"
+
+
+class TaskStatusCount(db.Model):
+    # Number of tasks per assignee and status, kept up to date by wms/task_board.py
+    __table_args__ = (db.UniqueConstraint('user_id', 'status', name='uq_task_status_count'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    def __repr__(self):
+        return f"TaskStatusCount('{self.user_id}', '{self.status}', {self.count})"
+
+
 class Shift(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, nullable=False)
@@ -67,6 +125,10 @@ class Shift(db.Model):
 
 
 class Attendance(db.Model):
+    # AUTOINCREMENT so SQLite never hands out the id of a row moved to the archive
+    __table_args__ = (db.Index('ix_attendance_user_clock_in', 'user_id', 'clock_in_time'),
+                      {'sqlite_autoincrement': True})
+
     id = db.Column(db.Integer, primary_key=True)
     clock_in_time = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
     clock_out_time = db.Column(db.DateTime, nullable=True)
@@ -95,7 +157,7 @@ class Document(db.Model):
     filename = db.Column(db.String(100), nullable=False)
     category = db.Column(db.String(50), nullable=False, default='General') # e.g., 'General', 'Payslip', 'Contract'
     upload_date = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
-    expiry_date = db.Column(db.Date, nullable=True)
+    expiry_date = db.Column(db.Date, nullable=True, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref='documents')
 
@@ -131,6 +193,8 @@ class Evaluation(db.Model):
 
 
 class Announcement(db.Model):
+    __table_args__ = (db.Index('ix_announcement_date_posted_id', 'date_posted', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(Text, nullable=False)
@@ -139,12 +203,16 @@ class Announcement(db.Model):
     user = db.relationship('User', backref='announcements')
     image_file = db.Column(db.String(100), nullable=True)  # New field for image
     video_file = db.Column(db.String(100), nullable=True)  # New field for video
+    reads = db.relationship('AnnouncementRead', backref='announcement', cascade='all, delete-orphan')
 
     def __repr__(self):
         return f"Announcement('{self.title}', '{self.date_posted}')"
 
 
 class Message(db.Model):
+    # Ids stay unique across the archive, as for Attendance
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     date_sent = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
@@ -164,19 +232,236 @@ class Asset(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(Text, nullable=True)
     status = db.Column(db.String(50), nullable=False, default='Available')  # Available, Checked Out, In Maintenance
+    # Denormalized pointers to the current checkout so check-in never scans the log history
+    holder_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    open_log_id = db.Column(db.Integer, db.ForeignKey('asset_log.id', use_alter=True, name='fk_asset_open_log_id'), nullable=True)
+    holder = db.relationship('User', foreign_keys=[holder_id])
+    open_log = db.relationship('AssetLog', foreign_keys=[open_log_id], post_update=True)
 
     def __repr__(self):
         return f"Asset('{self.name}', '{self.status}')"
 
 
 class AssetLog(db.Model):
+    # At most one open log per asset; also serves the "who has it" lookup
+    __table_args__ = (db.Index('ix_asset_log_open', 'asset_id', unique=True,
+                               sqlite_where=db.text('check_in_time IS NULL'),
+                               postgresql_where=db.text('check_in_time IS NULL')),
+                      db.Index('ix_asset_log_asset_check_out', 'asset_id', 'check_out_time'),
+                      # Ids stay unique across the archive, as for Attendance
+                      {'sqlite_autoincrement': True})
+
     id = db.Column(db.Integer, primary_key=True)
     check_out_time = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
     check_in_time = db.Column(db.DateTime, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     asset_id = db.Column(db.Integer, db.ForeignKey('asset.id'), nullable=False)
     user = db.relationship('User', backref='asset_logs')
-    asset = db.relationship('Asset', backref='logs')
+    asset = db.relationship('Asset', foreign_keys=[asset_id], backref='logs')
+
+    def __repr__(self):
+        return f"AssetLog('{self.asset.name}', '{self.user.username}', '{self.check_out_time}')"
+
+
+class KioskPunch(db.Model):
+    # Ids stay unique across the archive, as for Attendance
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(64), unique=True, nullable=False)
+    punch_time = db.Column(db.DateTime, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # in, out
+    date_received = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    attendance_id = db.Column(db.Integer, db.ForeignKey('attendance.id'), nullable=False)
+    user = db.relationship('User')
+    attendance = db.relationship('Attendance')
+
+    def __repr__(self):
+        return f"KioskPunch('{self.idempotency_key}', '{self.action}', '{self.punch_time}')"
+
+
+
+class AssetUsage(db.Model):
+    # Monthly usage rollup per asset and borrower, updated on every check-in
+    __table_args__ = (db.UniqueConstraint('asset_id', 'user_id', 'period_start', name='uq_asset_usage_period'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    period_start = db.Column(Date, nullable=False, index=True)  # first day of the month
+    checkouts = db.Column(db.Integer, nullable=False, default=0)  # checkouts that started this month
+    checkout_seconds = db.Column(db.Float, nullable=False, default=0)  # full length of those checkouts
+    seconds_used = db.Column(db.Float, nullable=False, default=0)  # checked-out time falling inside this month
+    asset_id = db.Column(db.Integer, db.ForeignKey('asset.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    asset = db.relationship('Asset')
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f"AssetUsage('{self.asset_id}', '{self.user_id}', '{self.period_start}')"
+
+
+
+class ExpiringDocument(db.Model):
+    # Precomputed "expiring soon" queue, refreshed by `flask scan-document-expiry`
+    id = db.Column(db.Integer, primary_key=True)
+    expiry_date = db.Column(Date, nullable=False, index=True)
+    date_computed = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    document = db.relationship('Document')
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f"ExpiringDocument('{self.document_id}', '{self.expiry_date}')"
+
+
+class AnnouncementReadState(db.Model):
+    # Per-user high-water mark: every announcement at or before
+    # (read_through_posted, read_through_id) in feed order counts as read
+    id = db.Column(db.Integer, primary_key=True)
+    read_through_posted = db.Column(db.DateTime, nullable=True)
+    read_through_id = db.Column(db.Integer, nullable=True)
+    date_updated = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
+    user = db.relationship('User', backref=db.backref('announcement_read_state', uselist=False))
+
+    def __repr__(self):
+        return f"AnnouncementReadState('{self.user_id}', '{self.read_through_posted}', '{self.read_through_id}')"
+
+
+class AnnouncementRead(db.Model):
+    # Exceptions above a user's high-water mark, i.e. announcements read out
+    # of order; folded back into the mark as soon as the gap below them closes
+    __table_args__ = (db.UniqueConstraint('user_id', 'announcement_id', name='uq_announcement_read'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    announcement_id = db.Column(db.Integer, db.ForeignKey('announcement.id'), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"AnnouncementRead('{self.user_id}', '{self.announcement_id}')"
+
+
+class OutboxEntry(db.Model):
+    # A notification waiting to be delivered on one channel, written in the
+    # same transaction as the change it reports (see wms/notifications.py)
+    __table_args__ = (db.Index('ix_outbox_entry_status_due', 'status', 'next_attempt_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # 'email', 'inapp', ...
+    kind = db.Column(db.String(30), nullable=False)  # what happened, e.g. 'leave_decision'
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(Text, nullable=False)
+    url = db.Column(db.String(300), nullable=True)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(Text, nullable=True)
+    date_created = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    def __repr__(self):
+        return f"OutboxEntry('{self.channel}', '{self.kind}', '{self.status}')"
+
+
+class Notification(db.Model):
+    # In-app notifications, delivered from the outbox
+    __table_args__ = (db.Index('ix_notification_user_read', 'user_id', 'read'),
+                      db.Index('ix_notification_user_created', 'user_id', 'date_created', 'id'))
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(Text, nullable=False)
+    url = db.Column(db.String(300), nullable=True)
+    read = db.Column(db.Boolean, nullable=False, default=False)
+    date_created = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    def __repr__(self):
+        return f"Notification('{self.user_id}', '{self.subject}')"
+
+
+class AuditEvent(db.Model):
+    # Append-only record of sensitive actions, written by wms/audit.py
+    __table_args__ = (db.Index('ix_audit_event_created', 'date_created', 'id'),
+                      db.Index('ix_audit_event_target', 'target_type', 'target_id', 'date_created', 'id'),
+                      db.Index('ix_audit_event_actor', 'actor_id', 'date_created', 'id'),
+                      db.Index('ix_audit_event_action', 'action', 'date_created', 'id'))
+
+    id = db.Column(db.Integer, primary_key=True)
+    action = db.Column(db.String(40), nullable=False)  # e.g. 'user.role_changed'
+    target_type = db.Column(db.String(30), nullable=False)  # 'user', 'leave_request', 'asset', ...
+    target_id = db.Column(db.Integer, nullable=False)
+    before = db.Column(Text, nullable=True)  # JSON
+    after = db.Column(Text, nullable=True)  # JSON
+    remote_addr = db.Column(db.String(45), nullable=True)
+    date_created = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    actor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # None for jobs
+    actor = db.relationship('User')
+
+    def __repr__(self):
+        return f"AuditEvent('{self.action}', '{self.target_type}', '{self.target_id}')"
+
+
+# History moved out of the live tables by `flask archive-history` (see wms/archive.py).
+# Rows keep their ids and columns; nothing writes to these tables except the archiver.
+
+
+class ArchivedAttendance(db.Model):
+    __table_args__ = (db.Index('ix_archived_attendance_user_clock_in', 'user_id', 'clock_in_time'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    clock_in_time = db.Column(db.DateTime, nullable=False)
+    clock_out_time = db.Column(db.DateTime, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f"ArchivedAttendance('{self.user_id}', '{self.clock_in_time}')"
+
+
+class ArchivedKioskPunch(db.Model):
+    # Archived together with the attendance row it belongs to
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    idempotency_key = db.Column(db.String(64), nullable=False, index=True)
+    punch_time = db.Column(db.DateTime, nullable=False)
+    action = db.Column(db.String(10), nullable=False)
+    date_received = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    attendance_id = db.Column(db.Integer, db.ForeignKey('archived_attendance.id'), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"ArchivedKioskPunch('{self.idempotency_key}', '{self.action}', '{self.punch_time}')"
+
+
+class ArchivedMessage(db.Model):
+    __table_args__ = (db.Index('ix_archived_message_sender_recipient', 'sender_id', 'recipient_id', 'date_sent'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    content = db.Column(Text, nullable=False)
+    date_sent = db.Column(db.DateTime, nullable=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    read = db.Column(db.Boolean, default=False)
+    sender = db.relationship('User', foreign_keys=[sender_id])
+    recipient = db.relationship('User', foreign_keys=[recipient_id])
+
+    def __repr__(self):
+        return f"ArchivedMessage('{self.sender_id}', '{self.recipient_id}', '{self.date_sent}')"
+
+
+class ArchivedAssetLog(db.Model):
+    __table_args__ = (db.Index('ix_archived_asset_log_asset_check_out', 'asset_id', 'check_out_time'),)
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    check_out_time = db.Column(db.DateTime, nullable=False)
+    check_in_time = db.Column(db.DateTime, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    asset_id = db.Column(db.Integer, db.ForeignKey('asset.id'), nullable=False)
+    user = db.relationship('User')
+    asset = db.relationship('Asset')
 
     def __repr__(self):
-        return f"AssetLog('{self.asset.name}', '{self.user.username}', '{self.check_out_time}')"
\ No newline at end of file
+        return f"ArchivedAssetLog('{self.asset_id}', '{self.user_id}', '{self.check_out_time}')"
\ No newline at end of file
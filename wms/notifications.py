@@ -0,0 +1,179 @@
+"""
+Notification outbox.
+
+Request handlers call ``notify()`` before they commit. It writes one
+OutboxEntry per channel in NOTIFICATION_CHANNELS into the same
+transaction, so a notification exists exactly when the change it reports
+was committed, and the request never waits on a mail server.
+
+``flask run-notifications`` drains the outbox: it claims up to
+NOTIFICATION_BATCH_SIZE due entries at a time (a lease, so several workers
+can run side by side), hands each channel its share in one call, and marks
+the results with set-based UPDATEs. Failed entries are retried with
+exponential backoff until NOTIFICATION_MAX_ATTEMPTS, then left as 'failed'.
+
+Channels:
+
+- ``inapp`` writes Notification rows, shown at /notifications.
+- ``email`` sends over SMTP (MAIL_SERVER / MAIL_PORT), one connection per
+  batch. For development, point it at a local debug server such as
+  ``python -m aiosmtpd -n -l localhost:8025``.
+
+Other channels can be added with ``register_channel()``.
+"""
+import datetime
+import random
+import smtplib
+import time
+from email.message import EmailMessage
+
+from flask import current_app
+from sqlalchemy import update
+
+from wms import db
+from wms.models import User, OutboxEntry, Notification
+
+
+class InAppChannel:
+    def deliver(self, entries):
+        """Insert the entries as Notifications; returns {entry id: error} for failures."""
+        db.session.execute(Notification.__table__.insert(), [
+            {'kind': entry.kind, 'subject': entry.subject, 'body': entry.body, 'url': entry.url,
+             'read': False, 'date_created': entry.date_created, 'user_id': entry.user_id}
+            for entry in entries])
+        return {}
+
+
+class EmailChannel:
+    def deliver(self, entries):
+        """Email each entry to its user over one SMTP connection; returns {entry id: error} for failures."""
+        config = current_app.config
+        emails = dict(db.session.query(User.id, User.email).filter(User.id.in_({entry.user_id for entry in entries})))
+        sent, failures = set(), {}
+        try:
+            with smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=config['MAIL_TIMEOUT']) as smtp:
+                if config['MAIL_USE_TLS']:
+                    smtp.starttls()
+                if config['MAIL_USERNAME']:
+                    smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+                for entry in entries:
+                    if not emails.get(entry.user_id):
+                        failures[entry.id] = 'The user has no email address.'
+                        continue
+                    try:
+                        smtp.send_message(self._message(entry, emails[entry.user_id]))
+                        sent.add(entry.id)
+                    except smtplib.SMTPRecipientsRefused as e:
+                        failures[entry.id] = str(e)
+        except (OSError, smtplib.SMTPException) as e:
+            failures.update({entry.id: str(e) for entry in entries if entry.id not in sent and entry.id not in failures})
+        return failures
+
+    def _message(self, entry, address):
+        config = current_app.config
+        message = EmailMessage()
+        message['From'] = config['MAIL_DEFAULT_SENDER']
+        message['To'] = address
+        message['Subject'] = entry.subject
+        body = entry.body
+        if entry.url:
+            body += f"\n\n{config['NOTIFICATION_BASE_URL'].rstrip('/')}{entry.url}"
+        message.set_content(body)
+        return message
+
+
+CHANNELS = {'inapp': InAppChannel(), 'email': EmailChannel()}
+
+
+def register_channel(name, channel):
+    """Make ``channel`` (an object with ``deliver(entries) -> {entry id: error}``) available as ``name``."""
+    CHANNELS[name] = channel
+
+
+def _channels():
+    return [name.strip() for name in current_app.config['NOTIFICATION_CHANNELS'].split(',') if name.strip()]
+
+
+def notify(user_ids, kind, subject, body, url=None):
+    """Queue a notification to each of ``user_ids`` (or one user id) on every configured channel (no commit)."""
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    now = datetime.datetime.utcnow()
+    rows = [{'channel': channel, 'kind': kind, 'subject': subject, 'body': body, 'url': url, 'status': 'pending',
+             'attempts': 0, 'date_created': now, 'next_attempt_at': now, 'user_id': user_id}
+            for user_id in user_ids for channel in _channels()]
+    if rows:
+        db.session.execute(OutboxEntry.__table__.insert(), rows)
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the ``attempts``-th failure: doubling from the base, capped, with a little jitter."""
+    config = current_app.config
+    delay = min(config['NOTIFICATION_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1), config['NOTIFICATION_RETRY_MAX_SECONDS'])
+    return delay * random.uniform(1.0, 1.1)
+
+
+def _claim(now):
+    """Lease up to a batch of due entries to this worker and return them."""
+    ids = [entry_id for entry_id, in db.session.query(OutboxEntry.id).
+           filter(OutboxEntry.status == 'pending', OutboxEntry.next_attempt_at <= now).
+           order_by(OutboxEntry.next_attempt_at, OutboxEntry.id).
+           limit(current_app.config['NOTIFICATION_BATCH_SIZE'])]
+    if not ids:
+        db.session.rollback()
+        return []
+    lease = now + datetime.timedelta(seconds=current_app.config['NOTIFICATION_LEASE_SECONDS'])
+    claimed = db.session.execute(
+        update(OutboxEntry).
+        where(OutboxEntry.id.in_(ids), OutboxEntry.status == 'pending', OutboxEntry.next_attempt_at <= now).
+        values(next_attempt_at=lease).
+        returning(OutboxEntry.id).
+        execution_options(synchronize_session=False)).scalars().all()
+    db.session.commit()
+    return OutboxEntry.query.filter(OutboxEntry.id.in_(claimed)).all() if claimed else []
+
+
+def _record_failures(entries, failures, now):
+    max_attempts = current_app.config['NOTIFICATION_MAX_ATTEMPTS']
+    for entry in entries:
+        if entry.id in failures:
+            entry.attempts += 1
+            entry.last_error = failures[entry.id][:1000]
+            if entry.attempts >= max_attempts:
+                entry.status = 'failed'
+            else:
+                entry.next_attempt_at = now + datetime.timedelta(seconds=retry_delay(entry.attempts))
+
+
+def deliver_pending(now=None):
+    """Deliver one batch of due outbox entries; returns how many were attempted."""
+    now = now or datetime.datetime.utcnow()
+    entries = _claim(now)
+    by_channel = {}
+    for entry in entries:
+        by_channel.setdefault(entry.channel, []).append(entry)
+    for name, group in by_channel.items():
+        channel = CHANNELS.get(name)
+        try:
+            failures = channel.deliver(group) if channel else {entry.id: f"No channel named '{name}'" for entry in group}
+        except Exception as e:
+            current_app.logger.exception('Notification channel %s failed', name)
+            db.session.rollback()
+            failures = {entry.id: f'{type(e).__name__}: {e}' for entry in group}
+        delivered = [entry.id for entry in group if entry.id not in failures]
+        if delivered:
+            db.session.execute(
+                update(OutboxEntry).
+                where(OutboxEntry.id.in_(delivered)).
+                values(status='sent', sent_at=now, attempts=OutboxEntry.attempts + 1).
+                execution_options(synchronize_session=False))
+        _record_failures(group, failures, now)
+        db.session.commit()
+    return len(entries)
+
+
+def run(should_stop=lambda: False):
+    """Drain the outbox until ``should_stop()`` returns True, sleeping while it is empty."""
+    while not should_stop():
+        if not deliver_pending():
+            time.sleep(current_app.config['NOTIFICATION_POLL_SECONDS'])
\ No newline at end of file
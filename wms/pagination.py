@@ -0,0 +1,48 @@
+import datetime
+
+from sqlalchemy import or_, and_
+
+
+def encode_cursor(timestamp, row_id):
+    return f"{timestamp.isoformat()}_{row_id}"
+
+
+def decode_cursor(value):
+    """Turn a cursor from the query string back into (timestamp, id), or None if it is malformed."""
+    if not value:
+        return None
+    try:
+        timestamp, row_id = value.rsplit('_', 1)
+        return datetime.datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        return None
+
+
+def keyset_page(query, time_column, id_column, cursor=None, per_page=25, descending=True):
+    """Return one newest-first page of ``query`` and the cursor for the next page.
+
+    Pages are addressed by the (timestamp, id) of the last row shown rather
+    than an OFFSET, so page 500 costs the same index range scan as page 1
+    and rows inserted meanwhile don't shift the pages. ``next_cursor`` is
+    None on the last page. ``descending=False`` pages oldest-first instead.
+    """
+    position = decode_cursor(cursor)
+    if position:
+        timestamp, row_id = position
+        if descending:
+            query = query.filter(or_(time_column < timestamp,
+                                     and_(time_column == timestamp, id_column < row_id)))
+        else:
+            query = query.filter(or_(time_column > timestamp,
+                                     and_(time_column == timestamp, id_column > row_id)))
+    if descending:
+        query = query.order_by(time_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(time_column, id_column)
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, time_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
\ No newline at end of file
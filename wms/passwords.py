@@ -0,0 +1,112 @@
+"""
+Password verification for the login path.
+
+Hash parameters come from ``PASSWORD_HASH_METHOD`` so they can be tuned
+without a code change; stored hashes made with other parameters are
+upgraded the next time their owner logs in successfully.
+
+Verification is the most CPU-hungry thing a request can do, so it runs in
+a small per-process thread pool (``hashlib`` releases the GIL while
+hashing) with a bounded queue: at a login spike the excess attempts are
+turned away quickly instead of tying up every worker. Repeated failures
+for the same email (LOGIN_MAX_ATTEMPTS) or address (the much higher
+LOGIN_MAX_ATTEMPTS_PER_ADDRESS, as whole sites share one behind NAT) are
+refused before any hashing happens.
+Both limits are per process, like the other in-memory caches.
+"""
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from wms import db
+from wms.cache import LRUCache
+from wms.models import User
+
+
+class LoginThrottled(Exception):
+    pass
+
+
+class LoginBusy(Exception):
+    pass
+
+
+def init_app(app):
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    app.extensions['password_hashing'] = {
+        'pool': ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash'),
+        'slots': threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE']),
+        'failures': LRUCache(maxsize=65536, ttl=app.config['LOGIN_THROTTLE_WINDOW']),
+    }
+
+
+def _state():
+    return current_app.extensions['password_hashing']
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+
+@functools.lru_cache(maxsize=None)
+def _canonical_method(method):
+    # werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"); read them back off a throwaway hash
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != _canonical_method(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def _verify(password_hash, password):
+    """Run check_password_hash in the hashing pool, or raise LoginBusy if its queue is full."""
+    state = _state()
+    if not state['slots'].acquire(blocking=False):
+        raise LoginBusy()
+    try:
+        return state['pool'].submit(check_password_hash, password_hash, password).result()
+    finally:
+        state['slots'].release()
+
+
+def _failure_keys(email, remote_addr):
+    return ('email', email.strip().lower()), ('addr', remote_addr)
+
+
+# Failure key kind -> setting holding its limit
+_LIMITS = {'email': 'LOGIN_MAX_ATTEMPTS', 'addr': 'LOGIN_MAX_ATTEMPTS_PER_ADDRESS'}
+
+
+def _throttled(keys):
+    failures = _state()['failures']
+    return any(failures.get(key, 0) >= current_app.config[_LIMITS[key[0]]] for key in keys)
+
+
+def _record_failure(keys):
+    failures = _state()['failures']
+    for key in keys:
+        failures.set(key, failures.get(key, 0) + 1)
+
+
+def authenticate(email, password, remote_addr=None):
+    """Return the user for these credentials, or None if they are wrong.
+
+    Raises LoginThrottled after too many recent failures for the email or
+    address, and LoginBusy when the hashing pool is saturated. A successful
+    login with an outdated hash stores a fresh one (commits).
+    """
+    keys = _failure_keys(email, remote_addr)
+    if _throttled(keys):
+        raise LoginThrottled()
+    user = User.query.filter_by(email=email).first()
+    if user is None or not user.password_hash or not _verify(user.password_hash, password):
+        _record_failure(keys)
+        return None
+    _state()['failures'].delete(keys[0])
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+        db.session.commit()
+    return user
\ No newline at end of file
@@ -0,0 +1,28 @@
+from enum import IntFlag
+
+
+class Permission(IntFlag):
+    MANAGE_TASKS = 1 << 0
+    MANAGE_SHIFTS = 1 << 1
+    REVIEW_LEAVE = 1 << 2
+    MANAGE_DOCUMENTS = 1 << 3
+    VIEW_ANALYTICS = 1 << 4
+    MANAGE_ANNOUNCEMENTS = 1 << 5
+    MANAGE_ASSETS = 1 << 6
+    EVALUATE_EMPLOYEES = 1 << 7
+    VIEW_TEAM_RECORDS = 1 << 8  # other people's goals and evaluations
+    MANAGE_USERS = 1 << 9
+
+
+_MANAGER = (Permission.MANAGE_TASKS | Permission.MANAGE_SHIFTS | Permission.REVIEW_LEAVE |
+            Permission.MANAGE_DOCUMENTS | Permission.VIEW_ANALYTICS | Permission.MANAGE_ANNOUNCEMENTS |
+            Permission.MANAGE_ASSETS | Permission.EVALUATE_EMPLOYEES | Permission.VIEW_TEAM_RECORDS)
+
+# Role -> permission bits, built once at import so a check is a dict lookup and an AND
+ROLE_PERMISSIONS = {
+    'Employee': Permission(0),
+    'Manager': _MANAGER,
+    'Admin': _MANAGER | Permission.MANAGE_USERS,
+}
+
+ROLES = tuple(ROLE_PERMISSIONS)
\ No newline at end of file
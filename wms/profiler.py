@@ -0,0 +1,209 @@
+"""
+Opt-in request profiler.
+
+Off unless PROFILER_ENABLED is set. A request is profiled when:
+
+- it carries a valid ``X-WMS-Profile`` token (an Admin can copy one from
+  the Profiles page; tokens are signed with SECRET_KEY and expire), or
+- it is picked by PROFILER_SAMPLE_RATE (a fraction of all requests).
+
+Both are run under cProfile. With PROFILER_THRESHOLD_MS set, every other
+request is watched by a stack sampler thread instead, which costs far less
+than cProfile; requests that end up slower than the threshold keep their
+sampled stacks (in "collapsed" flame graph format).
+
+Each kept profile also records the SQL statements the request executed,
+and is written to PROFILER_DIR. Only the newest PROFILER_MAX_PROFILES are
+kept on disk.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, request
+from itsdangerous import BadSignature, TimestampSigner
+
+HEADER = 'X-WMS-Profile'
+_TOKEN_VALUE = 'profile'
+
+
+def init_app(app):
+    if not app.config['PROFILER_ENABLED']:
+        return
+    os.makedirs(app.config['PROFILER_DIR'], exist_ok=True)
+    app.extensions['profiler'] = {
+        'sampler': StackSampler(app.config['PROFILER_INTERVAL_MS'] / 1000) if app.config['PROFILER_THRESHOLD_MS'] else None,
+        'lock': threading.Lock(),
+    }
+    app.before_request(_start_profile)
+    app.after_request(_save_profile)
+    app.teardown_request(_stop_profile)
+
+
+def enabled():
+    return 'profiler' in current_app.extensions
+
+
+def _signer():
+    return TimestampSigner(current_app.config['SECRET_KEY'], salt='wms-profiler')
+
+
+def make_token():
+    return _signer().sign(_TOKEN_VALUE).decode()
+
+
+def _valid_token(token):
+    try:
+        return _signer().unsign(token, max_age=current_app.config['PROFILER_TOKEN_MAX_AGE']) == _TOKEN_VALUE.encode()
+    except BadSignature:
+        return False
+
+
+class StackSampler:
+    """Samples the stacks of registered threads every ``interval`` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.watched = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def watch(self):
+        stacks = Counter()
+        with self.lock:
+            self.watched[threading.get_ident()] = stacks
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+                self.thread.start()
+        return stacks
+
+    def unwatch(self):
+        with self.lock:
+            self.watched.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                watched = list(self.watched.items())
+            if not watched:
+                continue
+            frames = sys._current_frames()
+            for thread_id, stacks in watched:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[_collapse(frame)] += 1
+
+
+def _collapse(frame, limit=128):
+    names = []
+    while frame is not None and len(names) < limit:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _start_profile():
+    g.profile_started = time.perf_counter()
+    token = request.headers.get(HEADER)
+    if (token and _valid_token(token)) or random.random() < current_app.config['PROFILER_SAMPLE_RATE']:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return  # another profiler is already running in this process
+        g.profile = profile
+        g.sql_log = []
+    elif current_app.extensions['profiler']['sampler'] is not None:
+        g.profile_stacks = current_app.extensions['profiler']['sampler'].watch()
+        g.sql_log = []
+
+
+def _stop_profile(exc=None):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.disable()
+    if g.pop('profile_stacks', None) is not None:
+        current_app.extensions['profiler']['sampler'].unwatch()
+
+
+def _save_profile(response):
+    if 'profile' not in g and 'profile_stacks' not in g:
+        return response
+    seconds = time.perf_counter() - g.profile_started
+    profile, stacks = g.get('profile'), g.get('profile_stacks')
+    _stop_profile()
+    if profile is None and seconds * 1000 < current_app.config['PROFILER_THRESHOLD_MS']:
+        return response
+    meta = {
+        'endpoint': request.endpoint, 'method': request.method, 'path': request.full_path.rstrip('?'),
+        'status': response.status_code, 'duration_ms': round(seconds * 1000, 2),
+        'recorded': time.strftime('%Y-%m-%d %H:%M:%S'), 'kind': 'cprofile' if profile else 'stacks',
+        'sql': [{'ms': round(ms, 3), 'statement': statement} for ms, statement in g.pop('sql_log', [])],
+    }
+    try:
+        _write(meta, profile, stacks)
+    except OSError:
+        current_app.logger.exception('Could not save request profile')
+    return response
+
+
+def _write(meta, profile, stacks):
+    directory = current_app.config['PROFILER_DIR']
+    profile_id = f"{time.time_ns()}-{os.getpid()}-{threading.get_ident() % 100000}"
+    if profile is not None:
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(40)
+        meta['summary'] = summary.getvalue()
+        profile.dump_stats(os.path.join(directory, profile_id + '.prof'))
+    else:
+        meta['samples'] = sum(stacks.values())
+        with open(os.path.join(directory, profile_id + '.txt'), 'w') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    with open(os.path.join(directory, profile_id + '.json'), 'w') as f:
+        json.dump(meta, f)
+    _trim(directory)
+
+
+def _trim(directory):
+    with current_app.extensions['profiler']['lock']:
+        ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+        for profile_id in ids[:-current_app.config['PROFILER_MAX_PROFILES']]:
+            for extension in ('.json', '.prof', '.txt'):
+                try:
+                    os.remove(os.path.join(directory, profile_id + extension))
+                except FileNotFoundError:
+                    pass
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first."""
+    directory = current_app.config['PROFILER_DIR']
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue  # trimmed or still being written
+            meta['id'] = name[:-5]
+            profiles.append(meta)
+    return profiles
+
+
+def profile_file(profile_id, kind):
+    """Filename of a stored profile's ``kind`` ('json', 'prof' or 'txt') file, or None."""
+    filename = f"{profile_id}.{kind}"
+    if kind not in ('json', 'prof', 'txt') or os.path.basename(filename) != filename or \
+            not os.path.exists(os.path.join(current_app.config['PROFILER_DIR'], filename)):
+        return None
+    return filename
\ No newline at end of file
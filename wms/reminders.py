@@ -0,0 +1,136 @@
+"""
+Task deadline reminders.
+
+``ReminderScheduler`` runs as its own long-lived process (``flask
+run-reminders``). It keeps a heap of (remind_at, task id) for the tasks
+whose reminder falls within the next TASK_REMINDER_HORIZON_MINUTES, and
+sleeps until the earliest one is due:
+
+- The heap is filled by one range query over the partial index on the
+  deadlines of tasks not reminded yet, and refilled that way once per
+  horizon. Tasks whose deadline has already passed get no reminder.
+- Between refills, only tasks created since the last load (``id >`` the
+  highest id seen) are queried, so new tasks are picked up within
+  TASK_REMINDER_POLL_SECONDS without rereading the task table.
+- Tasks that were finished or already reminded while in the heap are
+  dropped when they come due: firing claims them with a conditional
+  UPDATE, so several scheduler processes never send the same reminder
+  twice.
+
+Each firing sends all due reminders as one batched INSERT of Messages
+from the task's assigner to its assignee.
+"""
+import datetime
+import heapq
+import time
+
+from flask import current_app
+from sqlalchemy import update
+
+from wms import db
+from wms.models import Task, Message
+
+
+def _lead():
+    return datetime.timedelta(minutes=current_app.config['TASK_REMINDER_LEAD_MINUTES'])
+
+
+def reminder_text(title, deadline):
+    return f"Reminder: the task '{title}' is due on {deadline.strftime('%b %d, %Y %H:%M')}."
+
+
+def send_reminders(task_ids, now=None):
+    """Claim the tasks with ``task_ids`` that still need a reminder, message their assignees and commit.
+
+    Returns the number of reminders sent.
+    """
+    if not task_ids:
+        return 0
+    now = now or datetime.datetime.utcnow()
+    claimed = db.session.execute(
+        update(Task).
+        where(Task.id.in_(task_ids), Task.reminder_sent_at.is_(None), Task.status != 'Done').
+        values(reminder_sent_at=now).
+        returning(Task.title, Task.deadline, Task.assigned_to_id, Task.assigned_by_id).
+        execution_options(synchronize_session=False)).all()
+    if claimed:
+        db.session.execute(Message.__table__.insert(), [
+            {'content': reminder_text(title, deadline), 'date_sent': now, 'read': False,
+             'sender_id': assigned_by_id, 'recipient_id': assigned_to_id}
+            for title, deadline, assigned_to_id, assigned_by_id in claimed])
+    db.session.commit()
+    return len(claimed)
+
+
+class ReminderScheduler:
+    def __init__(self, horizon=None, poll_interval=None, clock=datetime.datetime.utcnow):
+        config = current_app.config
+        self.horizon = horizon or datetime.timedelta(minutes=config['TASK_REMINDER_HORIZON_MINUTES'])
+        self.poll_interval = poll_interval if poll_interval is not None else config['TASK_REMINDER_POLL_SECONDS']
+        self.clock = clock
+        self.heap = []
+        self.queued = set()
+        self.last_id = 0
+        self.window_end = None
+
+    def _push(self, rows):
+        lead = _lead()
+        for task_id, deadline in rows:
+            if task_id not in self.queued:
+                heapq.heappush(self.heap, (deadline - lead, task_id))
+                self.queued.add(task_id)
+            self.last_id = max(self.last_id, task_id)
+
+    def _candidates(self, now):
+        # A range on ix_task_reminder_due (deadlines of tasks not reminded yet); deadlines
+        # already past get no reminder
+        return db.session.query(Task.id, Task.deadline).\
+            filter(Task.reminder_sent_at.is_(None), Task.status != 'Done',
+                   Task.deadline >= now, Task.deadline < self.window_end + _lead())
+
+    def load(self, now=None):
+        """Reload the heap with every reminder due before the end of the next horizon."""
+        now = now or self.clock()
+        self.heap, self.queued = [], set()
+        self.window_end = now + self.horizon
+        self.last_id = db.session.query(db.func.max(Task.id)).scalar() or 0
+        self._push(self._candidates(now).all())
+        db.session.rollback()  # end the read transaction; the scheduler holds no locks while it sleeps
+
+    def load_new(self, now=None):
+        """Queue tasks created since the last load whose reminder falls inside the current window."""
+        self._push(self._candidates(now or self.clock()).filter(Task.id > self.last_id).all())
+        db.session.rollback()
+
+    def fire_due(self, now=None):
+        """Send every reminder that is due now; returns the number sent."""
+        now = now or self.clock()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, task_id = heapq.heappop(self.heap)
+            self.queued.discard(task_id)
+            due.append(task_id)
+        sent = 0
+        batch_size = current_app.config['TASK_REMINDER_BATCH_SIZE']
+        for start in range(0, len(due), batch_size):
+            sent += send_reminders(due[start:start + batch_size], now)
+        return sent
+
+    def run_once(self, now=None):
+        now = now or self.clock()
+        if self.window_end is None or now >= self.window_end:
+            self.load(now)
+        else:
+            self.load_new(now)
+        return self.fire_due(now)
+
+    def run(self, should_stop=lambda: False):
+        """Fire reminders until ``should_stop()`` returns True."""
+        while not should_stop():
+            sent = self.run_once()
+            if sent:
+                current_app.logger.info('Sent %d task deadline reminders', sent)
+            now = self.clock()
+            wake = min(self.heap[0][0] if self.heap else self.window_end, self.window_end,
+                       now + datetime.timedelta(seconds=self.poll_interval))
+            time.sleep(max(0.0, (wake - now).total_seconds()))
\ No newline at end of file
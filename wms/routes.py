@@ -1,18 +1,42 @@
-from flask import render_template, url_for, flash, redirect, request, Blueprint, abort
+from flask import render_template, url_for, flash, redirect, request, Blueprint, abort, make_response, send_from_directory
 from flask_login import login_user, current_user, logout_user, login_required
-from wms import db
+from wms import db, csrf
 import datetime
 import os
 
-from wms.models import User, Task, Shift, Attendance, LeaveRequest, Document, Goal, Evaluation, Announcement, Message, Asset, AssetLog
-from wms.forms import (RegistrationForm, LoginForm, TaskForm, ShiftForm,
+from wms.models import User, Task, TaskBatch, Notification, Shift, Attendance, LeaveRequest, Document, Goal, Evaluation, Announcement, Message, Asset, AssetLog, ExpiringDocument
+from wms.forms import (RegistrationForm, LoginForm, TaskForm, BulkTaskForm, TaskBatchStatusForm, ShiftForm,
                        LeaveRequestForm, EmptyForm, DocumentForm, GoalForm,
                        EvaluationForm, AnnouncementForm, MessageForm,
                        AssetForm, PayslipUploadForm, AdminPasswordResetForm)
-from .decorators import roles_required
+from .decorators import permission_required, kiosk_token_required, metrics_token_required, read_only, response_options
+from .metrics import render_metrics
+from . import profiler
+from .database import use_primary
+from .permissions import Permission, ROLES
+from .kiosk import record_punches
+from .assets import check_out, check_in, AssetTransitionError
+from .asset_analytics import usage_report, month_start
+from .pagination import keyset_page
+from .document_expiry import track_document, expiring_documents_for, expiry_window
+from .announcement_feed import render_announcement, forget_announcement, feed_etag
+from .announcement_reads import mark_page_read, mark_all_read, read_stats, read_state_version
+from .announcement_reads import unread_count as unread_announcement_count
+from .passwords import authenticate, LoginThrottled, LoginBusy
+from .user_search import search_users as find_users, user_label
+from .notifications import notify
+from .archive import with_archive
+from . import audit
+from .dashboard_cache import section as dashboard_section, render_section, invalidate as invalidate_dashboard, \
+    SHARED as SHARED_SECTION
+from .task_board import (STATUSES as TASK_STATUSES, TaskTransitionError, TaskPermissionError, move_tasks,
+                         record_new_tasks, column as task_column, status_counts, task_json,
+                         resolve_assignees, assign_batch, move_batch, batch_summary)
 from werkzeug.utils import secure_filename
 from flask import current_app, jsonify
-from sqlalchemy import or_
+from sqlalchemy import extract, func, or_, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 import json
 
 main_bp = Blueprint('main', __name__)
@@ -21,53 +45,65 @@ main_bp = Blueprint('main', __name__)
 @main_bp.route("/home")
 @login_required
 def home():
-    # For admins/managers, show both tasks assigned to them AND tasks they created
-    if current_user.role in ['Admin', 'Manager']:
-        # Get tasks assigned to the admin/manager
-        assigned_tasks = current_user.tasks_assigned_to
-        # Get tasks created by the admin/manager
-        created_tasks = current_user.tasks_created_by
-        # Combine both sets of tasks (avoiding duplicates)
-        all_admin_tasks = list(set(assigned_tasks + created_tasks))
-        tasks = all_admin_tasks
-        print(f"DEBUG: Admin viewing tasks. Assigned: {len(assigned_tasks)}, Created: {len(created_tasks)}, Total: {len(tasks)}")
-    else:
-        # Regular users only see tasks assigned to them
-        tasks = current_user.tasks_assigned_to
-    # Get shifts based on user role
-    if current_user.role in ['Admin', 'Manager']:
-        # Admins and Managers see all shifts
-        from datetime import datetime, timedelta
-        now = datetime.utcnow()
-        # Include shifts from today (allow some buffer for recently created shifts)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        all_shifts = Shift.query.all()
-        upcoming_shifts = [shift for shift in all_shifts if shift.start_time >= today_start]
-        upcoming_shifts_count = len(upcoming_shifts)
-        
-        # Debug: Print shift information
-        print(f"DEBUG: Admin viewing all shifts. Total shifts: {len(all_shifts)}, Upcoming: {upcoming_shifts_count}")
-        print(f"DEBUG: Current time (UTC): {now}")
-        print(f"DEBUG: Filter start time: {today_start}")
-        for shift in all_shifts[:5]:  # Show first 5 shifts for debugging
-            print(f"DEBUG: Shift ID {shift.id}: {shift.user.username} - {shift.start_time} to {shift.end_time}")
-    else:
-        # Regular users see only their own shifts
-        shifts = current_user.shifts
-        # Filter to show only upcoming shifts (today and future)
-        from datetime import datetime, timedelta
-        now = datetime.utcnow()
-        # Include shifts from today (allow some buffer for recently created shifts)
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        upcoming_shifts = [shift for shift in shifts if shift.start_time >= today_start]
-        upcoming_shifts_count = len(upcoming_shifts)
-    
-    last_attendance = Attendance.query.filter_by(user_id=current_user.id).order_by(Attendance.clock_in_time.desc()).first()
-    attendance_history = Attendance.query.filter_by(user_id=current_user.id).order_by(Attendance.clock_in_time.desc()).limit(7).all()
-    leave_requests = current_user.leave_requests
-    goals = Goal.query.filter_by(user=current_user).filter(Goal.status != 'Archived').all()
+    # Each section comes from the per-user dashboard cache (wms.dashboard_cache) and is only
+    # rebuilt after a write that affects it
+    user = current_user._get_current_object()
+    stamp = str(int(user.permissions))
+    manages_shifts = user.can(Permission.MANAGE_SHIFTS)
+    today_start = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def build_tasks():
+        # For admins/managers, show both tasks assigned to them AND tasks they created
+        if user.can(Permission.MANAGE_TASKS):
+            task_query = Task.query.filter(or_(Task.assigned_to_id == user.id, Task.assigned_by_id == user.id))
+        else:
+            # Regular users only see tasks assigned to them
+            task_query = Task.query.filter(Task.assigned_to_id == user.id)
+        # Open tasks first, soonest deadline first; the full lists are on the task board
+        tasks = task_query.options(joinedload(Task.assigned_by)).\
+            order_by(Task.status == 'Done', Task.deadline, Task.id).limit(current_app.config['HOME_TASK_LIMIT']).all()
+        return {'html': render_section('_home_tasks.html', tasks=tasks, user=user),
+                'open_count': task_query.filter(Task.status != 'Done').count()}
+
+    def build_goals():
+        goals = Goal.query.filter_by(user_id=user.id).filter(Goal.status != 'Archived').all()
+        return {'html': render_section('_home_goals.html', goals=goals, user=user), 'count': len(goals)}
+
+    def build_shifts():
+        # Upcoming shifts (from the start of today): everyone's for Admins and Managers, else the user's own
+        shift_query = Shift.query.filter(Shift.start_time >= today_start)
+        if not user.can(Permission.MANAGE_SHIFTS):
+            shift_query = shift_query.filter(Shift.user_id == user.id)
+        shifts = shift_query.options(joinedload(Shift.user).joinedload(User.profile_picture)).order_by(Shift.id).all()
+        return {'html': render_section('_home_shifts.html', shifts=shifts, user=user), 'count': len(shifts)}
+
+    def build_attendance():
+        attendance_history = Attendance.query.filter_by(user_id=user.id).order_by(Attendance.clock_in_time.desc()).limit(7).all()
+        return {'html': render_section('_home_attendance.html', attendance_history=attendance_history)}
+
+    def build_leave():
+        leave_requests = LeaveRequest.query.filter_by(user_id=user.id).order_by(LeaveRequest.id).all()
+        return {'html': render_section('_home_leave.html', leave_requests=leave_requests)}
+
+    # The shifts list only depends on whether the user manages shifts, so Admins and
+    # Managers share one entry without evicting each other's
+    shifts_scope = SHARED_SECTION if manages_shifts else user.id
+    shifts_stamp = f'{int(manages_shifts)}:{today_start:%Y-%m-%d}'
+    sections = {
+        'tasks_section': dashboard_section('tasks', user.id, stamp, build_tasks),
+        'goals_section': dashboard_section('goals', user.id, stamp, build_goals),
+        'shifts_section': dashboard_section('shifts', shifts_scope, shifts_stamp, build_shifts),
+        'attendance_section': dashboard_section('attendance', user.id, stamp, build_attendance),
+        'leave_section': dashboard_section('leave', user.id, stamp, build_leave),
+    }
+    # The clock button drives clock_in_out(), so its state is read live rather than from
+    # the cache, which another worker may not have evicted yet
+    last_attendance = db.session.query(Attendance.clock_out_time).filter_by(user_id=user.id).\
+        order_by(Attendance.clock_in_time.desc(), Attendance.id.desc()).first()
+    clocked_in = last_attendance is not None and last_attendance.clock_out_time is None
+    expiring_documents, expiring_documents_count = expiring_documents_for(current_user)
     clock_form = EmptyForm()
-    return render_template('index.html', title='Home', tasks=tasks, shifts=upcoming_shifts, upcoming_shifts_count=upcoming_shifts_count, last_attendance=last_attendance, attendance_history=attendance_history, leave_requests=leave_requests, goals=goals, clock_form=clock_form)
+    return render_template('index.html', title='Home', expiring_documents=expiring_documents, expiring_documents_count=expiring_documents_count, clock_form=clock_form, clocked_in=clocked_in, **sections)
 
 @main_bp.route("/register", methods=['GET', 'POST'])
 def register():
@@ -89,8 +125,15 @@ def login():
         return redirect(url_for('main.home'))
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data):
+        try:
+            user = authenticate(form.email.data, form.password.data, request.remote_addr)
+        except LoginThrottled:
+            flash('Too many failed login attempts. Please wait a few minutes and try again.', 'danger')
+            return render_template('login.html', title='Login', form=form), 429
+        except LoginBusy:
+            flash('Lots of people are signing in right now. Please try again in a moment.', 'warning')
+            return render_template('login.html', title='Login', form=form), 503
+        if user:
             login_user(user, remember=form.remember.data)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('main.home'))
@@ -106,13 +149,9 @@ def logout():
 
 @main_bp.route("/task/new", methods=['GET', 'POST'])
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.MANAGE_TASKS)
 def new_task():
     form = TaskForm()
-    print(f"DEBUG: new_task route accessed by {current_user.username} with role {current_user.role}")
-    print(f"DEBUG: Form validate_on_submit: {form.validate_on_submit()}")
-    print(f"DEBUG: Form errors: {form.errors}")
-    
     if form.validate_on_submit():
         try:
             task = Task(title=form.title.data,
@@ -122,21 +161,60 @@ def new_task():
                         assigned_to=form.assigned_to.data,
                         assigned_by=current_user)
             db.session.add(task)
+            db.session.flush()
+            record_new_tasks([task])
+            if task.assigned_to_id != current_user.id:
+                notify(task.assigned_to_id, 'task_assigned', f'New task: {task.title}',
+                       f"{current_user.username} assigned you '{task.title}', due {task.deadline:%b %d, %Y}.",
+                       url_for('main.home'))
             db.session.commit()
             flash('The task has been created!', 'success')
-            print(f"DEBUG: Task created successfully: {task.title} assigned to {task.assigned_to.username}")
             return redirect(url_for('main.home'))
         except Exception as e:
-            print(f"DEBUG: Error creating task: {str(e)}")
+            current_app.logger.exception('Could not create task')
             flash(f'Error creating task: {str(e)}', 'danger')
             db.session.rollback()
     
     return render_template('create_task.html', title='New Task', form=form, legend='New Task')
 
 
+@main_bp.route("/task/bulk", methods=['GET', 'POST'])
+@login_required
+@permission_required(Permission.MANAGE_TASKS)
+def bulk_assign_tasks():
+    form = BulkTaskForm()
+    if form.validate_on_submit():
+        user_ids, unknown = resolve_assignees(form.role.data, form.identifiers())
+        if unknown:
+            form.users.errors.append('No user with this username or email: ' + ', '.join(unknown))
+        elif not user_ids:
+            form.role.errors.append('Choose a role or list at least one user.')
+        elif len(user_ids) > current_app.config['TASK_BULK_MAX_ASSIGNEES']:
+            form.role.errors.append(f"At most {current_app.config['TASK_BULK_MAX_ASSIGNEES']} people can get a task at once.")
+        else:
+            batch = assign_batch(form.title.data, form.description.data, form.priority.data, form.deadline.data,
+                                 user_ids, current_user)
+            flash(f'The task has been assigned to {batch.size} people (batch #{batch.id}).', 'success')
+            return redirect(url_for('main.task_batch', batch_id=batch.id))
+    return render_template('bulk_assign_tasks.html', title='Assign a Task to a Team', form=form)
+
+
+@main_bp.route("/task/batch/<int:batch_id>", methods=['GET', 'POST'])
+@login_required
+@permission_required(Permission.MANAGE_TASKS)
+def task_batch(batch_id):
+    batch = TaskBatch.query.get_or_404(batch_id)
+    form = TaskBatchStatusForm()
+    if form.validate_on_submit():
+        moved = move_batch(batch.id, form.status.data, current_user)
+        flash(f'{moved} tasks moved to {form.status.data}.', 'success')
+        return redirect(url_for('main.task_batch', batch_id=batch.id))
+    return render_template('task_batch.html', title=batch.title, batch=batch, counts=batch_summary(batch.id), form=form)
+
+
 @main_bp.route("/shift/new", methods=['GET', 'POST'])
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.MANAGE_SHIFTS)
 def new_shift():
     form = ShiftForm()
     if form.validate_on_submit():
@@ -144,6 +222,9 @@ def new_shift():
                       end_time=form.end_time.data,
                       user=form.user.data)
         db.session.add(shift)
+        notify(shift.user.id, 'shift_assigned', 'New shift',
+               f"You have a shift from {shift.start_time:%b %d, %Y %H:%M} to {shift.end_time:%b %d, %Y %H:%M}.",
+               url_for('main.home'))
         db.session.commit()
         flash('The shift has been created!', 'success')
         return redirect(url_for('main.home'))
@@ -153,7 +234,8 @@ def new_shift():
 @main_bp.route("/attendance/clock", methods=['POST'])
 @login_required
 def clock_in_out():
-    last_attendance = Attendance.query.filter_by(user_id=current_user.id).order_by(Attendance.clock_in_time.desc()).first()
+    last_attendance = Attendance.query.filter_by(user_id=current_user.id).\
+        order_by(Attendance.clock_in_time.desc(), Attendance.id.desc()).first()
 
     if last_attendance and last_attendance.clock_out_time is None:
         # Clock out
@@ -169,6 +251,122 @@ def clock_in_out():
     return redirect(url_for('main.home'))
 
 
+@main_bp.route("/api/tasks/board")
+@login_required
+def task_board():
+    # Columns of one user's board: ?user_id= (default: you), ?status= for a single column, ?cursor= for its next page
+    user_id = request.args.get('user_id', current_user.id, type=int)
+    if user_id != current_user.id and not current_user.permissions & (Permission.MANAGE_TASKS | Permission.VIEW_TEAM_RECORDS):
+        abort(403)
+    status = request.args.get('status')
+    if status is not None and status not in TASK_STATUSES:
+        abort(400)
+    per_page = current_app.config['TASK_BOARD_PAGE_SIZE']
+    columns = {}
+    for column_status in ([status] if status else TASK_STATUSES):
+        tasks, next_cursor = task_column(user_id, column_status, request.args.get('cursor') if status else None, per_page)
+        columns[column_status] = {'tasks': [task_json(task) for task in tasks], 'next_cursor': next_cursor}
+    counts = status_counts([user_id]).get(user_id, dict.fromkeys(TASK_STATUSES, 0))
+    return jsonify({'user_id': user_id, 'counts': counts, 'columns': columns})
+
+
+def _json_object():
+    # The request's JSON body, or None when it is missing or not an object
+    payload = request.get_json(silent=True)
+    return payload if isinstance(payload, dict) else None
+
+
+def _move_tasks_response(task_ids, payload):
+    try:
+        moved = move_tasks(task_ids, payload.get('status'), current_user, expected=payload.get('from'))
+    except TaskPermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    except TaskTransitionError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'moved': moved, 'status': payload['status']})
+
+
+@main_bp.route("/api/tasks/<int:task_id>/status", methods=['POST'])
+@login_required
+def move_task(task_id):
+    # JSON body: {"status": "In Progress", "from": "To Do" (optional)}
+    payload = _json_object()
+    if payload is None:
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    return _move_tasks_response([task_id], payload)
+
+
+@main_bp.route("/api/tasks/status", methods=['POST'])
+@login_required
+def move_tasks_bulk():
+    # JSON body: {"task_ids": [1, 2, 3], "status": "Done", "from": "In Progress" (optional)}
+    payload = _json_object()
+    if payload is None:
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    task_ids = payload.get('task_ids')
+    if not isinstance(task_ids, list) or not all(isinstance(task_id, int) for task_id in task_ids) or \
+            len(task_ids) > current_app.config['TASK_BOARD_MAX_BULK']:
+        return jsonify({'error': 'task_ids must be a list of at most '
+                                 f"{current_app.config['TASK_BOARD_MAX_BULK']} task ids."}), 400
+    return _move_tasks_response(task_ids, payload)
+
+
+@main_bp.route("/api/tasks/batches/<int:batch_id>/status", methods=['POST'])
+@login_required
+@permission_required(Permission.MANAGE_TASKS)
+def move_task_batch(batch_id):
+    # JSON body: {"status": "Done"}
+    batch = TaskBatch.query.get_or_404(batch_id)
+    payload = _json_object()
+    if payload is None:
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    try:
+        moved = move_batch(batch.id, payload.get('status'), current_user)
+    except TaskTransitionError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'batch_id': batch.id, 'moved': moved, 'counts': batch_summary(batch.id)})
+
+
+@main_bp.route("/api/users/search")
+@login_required
+def search_users():
+    # Used by the user pickers on the task, shift and document forms
+    if not current_user.permissions & (Permission.MANAGE_TASKS | Permission.MANAGE_SHIFTS | Permission.MANAGE_DOCUMENTS):
+        abort(403)
+    limit = max(1, min(request.args.get('limit', 10, type=int), current_app.config['USER_SEARCH_MAX_RESULTS']))
+    users = find_users(request.args.get('q', ''), limit)
+    return jsonify({'users': [{'id': user.id, 'username': user.username, 'email': user.email, 'label': user_label(user)}
+                              for user in users]})
+
+
+@main_bp.route("/metrics")
+@metrics_token_required
+@response_options(etag=False)  # different on every scrape
+def metrics():
+    return render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+@main_bp.route("/api/kiosk/punches", methods=['POST'])
+@csrf.exempt
+@kiosk_token_required
+def kiosk_punches():
+    payload = request.get_json(silent=True)
+    punches = payload.get('punches') if isinstance(payload, dict) else None
+    if not isinstance(punches, list) or not punches:
+        return jsonify({'error': 'Expected a non-empty "punches" list.'}), 400
+    if len(punches) > current_app.config['KIOSK_MAX_BATCH']:
+        return jsonify({'error': f"At most {current_app.config['KIOSK_MAX_BATCH']} punches per batch."}), 413
+
+    try:
+        results = record_punches(punches)
+        db.session.commit()
+    except IntegrityError:
+        # Another kiosk request recorded one of these keys first; a retry will report it as a duplicate
+        db.session.rollback()
+        return jsonify({'error': 'Some punches were recorded concurrently. Retry the batch.'}), 409
+    return jsonify({'results': results})
+
+
 @main_bp.route("/leave/new", methods=['GET', 'POST'])
 @login_required
 def new_leave_request():
@@ -187,31 +385,53 @@ def new_leave_request():
 
 @main_bp.route("/leave/requests")
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.REVIEW_LEAVE)
+@read_only
 def leave_requests():
-    requests = LeaveRequest.query.order_by(LeaveRequest.start_date.asc()).all()
+    requests = LeaveRequest.query.options(joinedload(LeaveRequest.user)).order_by(LeaveRequest.start_date.asc()).all()
     return render_template('leave_requests.html', title='Leave Requests', requests=requests)
 
 
 @main_bp.route("/leave/requests/<int:request_id>/approve", methods=['POST'])
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.REVIEW_LEAVE)
 def approve_leave_request(request_id):
     leave_request = LeaveRequest.query.get_or_404(request_id)
-    leave_request.status = 'Approved'
-    db.session.commit()
+    _decide_leave(leave_request, 'Approved')
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":     # NEW: Ajax request → JSON
         return jsonify({'status': 'Approved'})
     flash('The leave request has been approved.', 'success')
     return redirect(url_for('main.leave_requests'))
 
+def _decide_leave(leave_request, status):
+    # A conditional UPDATE, so only a real change (not a repeated click, nor the second of
+    # two reviewers deciding at once) is audited and notified; commits
+    before = leave_request.status
+    changed = db.session.execute(
+        update(LeaveRequest).
+        where(LeaveRequest.id == leave_request.id, LeaveRequest.status != status).
+        values(status=status).
+        execution_options(synchronize_session=False)).rowcount
+    db.session.expire(leave_request, ['status'])
+    if changed:
+        audit.record(f'leave.{status.lower()}', 'leave_request', leave_request.id,
+                     before={'status': before}, after={'status': status, 'user_id': leave_request.user_id})
+        _notify_leave_decision(leave_request)
+        invalidate_dashboard([leave_request.user_id], 'leave')
+    db.session.commit()
+
+def _notify_leave_decision(leave_request):
+    status = leave_request.status.lower()
+    notify(leave_request.user_id, 'leave_decision', f'Your leave request was {status}',
+           f"Your leave from {leave_request.start_date:%b %d, %Y} to {leave_request.end_date:%b %d, %Y} "
+           f"was {status} by {current_user.username}.", url_for('main.home'))
+
 @main_bp.route("/leave/requests/<int:request_id>/reject", methods=['POST'])
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.REVIEW_LEAVE)
 def reject_leave_request(request_id):
     leave_request = LeaveRequest.query.get_or_404(request_id)
-    leave_request.status = 'Rejected'
-    db.session.commit()
+    _decide_leave(leave_request, 'Rejected')
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":     # NEW
         return jsonify({'status': 'Rejected'})
     flash('The leave request has been rejected.', 'danger')
@@ -222,7 +442,7 @@ def reject_leave_request(request_id):
 
 @main_bp.route("/document/upload", methods=['GET', 'POST'])
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.MANAGE_DOCUMENTS)
 def upload_document():
     form = DocumentForm()
     if form.validate_on_submit():
@@ -238,6 +458,7 @@ def upload_document():
                             category=form.category.data,
                             expiry_date=form.expiry_date.data)
         db.session.add(document)
+        track_document(document)
         db.session.commit()
         flash('The document has been uploaded.', 'success')
         return redirect(url_for('main.documents'))
@@ -246,14 +467,24 @@ def upload_document():
 
 @main_bp.route("/documents")
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.MANAGE_DOCUMENTS)
+@read_only
 def documents():
     query = request.args.get('q')
-    if query:
-        docs = Document.query.filter(Document.filename.contains(query)).all()
+    expiring_only = request.args.get('expiring') == '1'
+    today = datetime.date.today()
+    if expiring_only:
+        # Served from the precomputed queue instead of scanning every document, skipping
+        # entries that have expired since the last scan
+        docs = Document.query.options(joinedload(Document.user)).\
+            join(ExpiringDocument, ExpiringDocument.document_id == Document.id).\
+            filter(ExpiringDocument.expiry_date >= today).order_by(ExpiringDocument.expiry_date.asc()).all()
+    elif query:
+        docs = Document.query.options(joinedload(Document.user)).filter(Document.filename.contains(query)).all()
     else:
-        docs = Document.query.all()
-    return render_template('documents.html', title='Document Management', documents=docs, today=datetime.date.today())
+        docs = Document.query.options(joinedload(Document.user)).all()
+    return render_template('documents.html', title='Document Management', documents=docs, today=today,
+                           expiry_window=expiry_window(), expiring_only=expiring_only)
 
 
 @main_bp.route("/my_payslips")
@@ -263,37 +494,39 @@ def my_payslips():
     return render_template('my_payslips.html', title='My Payslips', payslips=payslips)
 
 
+def _seconds_between(start, end):
+    # Length of a DATETIME interval in seconds; every database spells it differently
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * 86400
+    if dialect == 'postgresql':
+        return extract('epoch', end - start)
+    return func.timestampdiff(text('SECOND'), start, end)
+
+
 @main_bp.route("/analytics")
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.VIEW_ANALYTICS)
+@read_only
 def analytics():
-    # Calculate total hours worked by each employee
+    # Total hours worked by each employee, over all of history (archived shifts included),
+    # summed by the database in one grouped query
     users = User.query.all()
-    attendance_data = {}
-    for user in users:
-        total_duration = datetime.timedelta(0)
-        records = Attendance.query.filter_by(user_id=user.id).all()
-        for record in records:
-            if record.clock_in_time and record.clock_out_time:
-                total_duration += record.clock_out_time - record.clock_in_time
-        attendance_data[user.username] = total_duration.total_seconds() / 3600
-
-    # Get task data by user and status
+    attendance = with_archive(Attendance)
+    worked = func.sum(_seconds_between(attendance.clock_in_time, attendance.clock_out_time))
+    seconds_by_user = dict(db.session.query(attendance.user_id, worked).\
+                           filter(attendance.clock_in_time.isnot(None), attendance.clock_out_time.isnot(None)).\
+                           group_by(attendance.user_id))
+    attendance_data = {user.username: (seconds_by_user.get(user.id) or 0) / 3600 for user in users}
+
+    # Task counts by user and status, read from the task board's counters
+    counts = status_counts()
+    no_tasks = dict.fromkeys(TASK_STATUSES, 0)
     task_data = {
-        'pending': [],
-        'in_progress': [],
-        'completed': []
+        'to_do': [counts.get(user.id, no_tasks)['To Do'] for user in users],
+        'in_progress': [counts.get(user.id, no_tasks)['In Progress'] for user in users],
+        'done': [counts.get(user.id, no_tasks)['Done'] for user in users],
     }
-    
-    for user in users:
-        # Count tasks by status for each user
-        pending_count = Task.query.filter_by(assigned_to=user).filter(Task.status == 'Pending').count()
-        in_progress_count = Task.query.filter_by(assigned_to=user).filter(Task.status == 'In Progress').count()
-        completed_count = Task.query.filter_by(assigned_to=user).filter(Task.status == 'Completed').count()
-        
-        task_data['pending'].append(pending_count)
-        task_data['in_progress'].append(in_progress_count)
-        task_data['completed'].append(completed_count)
 
     chart_data = {
         'labels': list(attendance_data.keys()),
@@ -324,7 +557,7 @@ def new_goal():
 @login_required
 def edit_goal(goal_id):
     goal = Goal.query.get_or_404(goal_id)
-    if goal.user != current_user and current_user.role not in ['Admin', 'Manager']:
+    if goal.user != current_user and not current_user.can(Permission.VIEW_TEAM_RECORDS):
         abort(403)
 
     form = GoalForm(obj=goal)
@@ -341,7 +574,7 @@ def edit_goal(goal_id):
 
 @main_bp.route("/evaluation/new/<int:employee_id>", methods=['GET', 'POST'])
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.EVALUATE_EMPLOYEES)
 def new_evaluation(employee_id):
     employee = User.query.get_or_404(employee_id)
     form = EvaluationForm()
@@ -361,7 +594,7 @@ def new_evaluation(employee_id):
 @login_required
 def view_evaluations(user_id):
     user = User.query.get_or_404(user_id)
-    if user != current_user and current_user.role not in ['Admin', 'Manager']:
+    if user != current_user and not current_user.can(Permission.VIEW_TEAM_RECORDS):
         abort(403)
 
     evaluations = user.evaluations_received
@@ -370,9 +603,43 @@ def view_evaluations(user_id):
 
 @main_bp.route("/announcements")
 @login_required
+@read_only
 def announcements():
-    all_announcements = Announcement.query.order_by(Announcement.date_posted.desc()).all()
-    return render_template('announcements.html', title='Announcements', announcements=all_announcements)
+    cursor = request.args.get('before')
+    query = Announcement.query.options(joinedload(Announcement.user))
+    page, next_cursor = keyset_page(query, Announcement.date_posted, Announcement.id, cursor,
+                                    current_app.config['ANNOUNCEMENTS_PER_PAGE'])
+    with use_primary():
+        mark_page_read(current_user, page)
+
+    unread_messages = Message.query.filter_by(recipient_id=current_user.id, read=False).count()
+    unread_announcements = unread_announcement_count(current_user)
+    # The nav's notification badge is part of the page too
+    unread_notifications = Notification.query.filter_by(user_id=current_user.id, read=False).count()
+    show_stats = current_user.can(Permission.MANAGE_ANNOUNCEMENTS)
+    etag = feed_etag(cursor, unread_messages, unread_announcements, unread_notifications,
+                     read_state_version() if show_stats else '')
+    if etag and request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        feed = [(announcement, render_announcement(announcement)) for announcement in page]
+        readers, total_users = read_stats([announcement.id for announcement in page]) if show_stats else ({}, 0)
+        response = make_response(render_template('announcements.html', title='Announcements', feed=feed,
+                                                 next_cursor=next_cursor, readers=readers, total_users=total_users,
+                                                 unread_messages_count=unread_messages,
+                                                 unread_announcements_count=unread_announcements,
+                                                 unread_notifications_count=unread_notifications))
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@main_bp.route("/announcements/read_all", methods=['POST'])
+@login_required
+def mark_all_announcements_read():
+    mark_all_read(current_user)
+    return redirect(url_for('main.announcements'))
 
 
 UPLOAD_FOLDER = 'c:\\Users\\Spark Marley\\Desktop\\julies-try 3\\wms\\static\\uploads'
@@ -397,7 +664,7 @@ def save_announcement_media(media_file, media_type):
 
 @main_bp.route("/announcement/new", methods=['GET', 'POST'])
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.MANAGE_ANNOUNCEMENTS)
 def new_announcement():
     form = AnnouncementForm()
     if form.validate_on_submit():
@@ -422,17 +689,33 @@ def new_announcement():
 
 @main_bp.route("/announcement/<int:announcement_id>/delete", methods=['POST'])
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.MANAGE_ANNOUNCEMENTS)
 def delete_announcement(announcement_id):
     announcement = Announcement.query.get_or_404(announcement_id)
+    forget_announcement(announcement)
     db.session.delete(announcement)
     db.session.commit()
     flash('The announcement has been deleted.', 'success')
     return redirect(url_for('main.announcements'))
 
 
+@main_bp.route("/notifications")
+@login_required
+def notifications():
+    page, next_cursor = keyset_page(Notification.query.filter_by(user_id=current_user.id),
+                                    Notification.date_created, Notification.id,
+                                    request.args.get('before'), current_app.config['NOTIFICATIONS_PER_PAGE'])
+    unread = [notification.id for notification in page if not notification.read]
+    if unread:
+        Notification.query.filter(Notification.id.in_(unread)).update({'read': True}, synchronize_session=False)
+        db.session.commit()
+    return render_template('notifications.html', title='Notifications', notifications=page, unread=set(unread),
+                           next_cursor=next_cursor)
+
+
 @main_bp.route("/messages")
 @login_required
+@read_only
 def messages():
     # Get search query from request args
     search_query = request.args.get('search', '')
@@ -451,12 +734,10 @@ def messages():
         ((Message.recipient_id == User.id) & (Message.sender_id == current_user.id))
     ).filter(User.id != current_user.id).distinct().all()
     
-    # Get unread messages
-    unread_by_user = {}
-    for user in conversations:
-        unread_count = Message.query.filter_by(sender_id=user.id, recipient_id=current_user.id, read=False).count()
-        if unread_count > 0:
-            unread_by_user[user.id] = unread_count
+    # Unread messages per sender, counted in one grouped query
+    unread_by_user = dict(db.session.query(Message.sender_id, func.count(Message.id)).\
+                          filter_by(recipient_id=current_user.id, read=False).\
+                          group_by(Message.sender_id))
     
     return render_template('messages.html', title='Messages', 
                           all_users=all_users, conversations=conversations, 
@@ -472,39 +753,65 @@ def conversation(recipient_id):
     if form.validate_on_submit():
         message = Message(content=form.content.data, sender=current_user, recipient=recipient)
         db.session.add(message)
+        notify(recipient.id, 'message', f'New message from {current_user.username}',
+               form.content.data, url_for('main.conversation', recipient_id=current_user.id))
         db.session.commit()
         flash('Your message has been sent.', 'success')
         return redirect(url_for('main.conversation', recipient_id=recipient_id))
     
-    # Get all messages between current user and recipient
-    sent_messages = Message.query.filter_by(sender=current_user, recipient=recipient).all()
-    received_messages = Message.query.filter_by(sender=recipient, recipient=current_user).all()
-    
-    # Mark received messages as read
-    for message in received_messages:
-        if not message.read:
-            message.read = True
-    
+    # Mark received messages as read with one UPDATE, committed before loading the
+    # conversation so the commit doesn't expire the messages the page shows
+    Message.query.filter_by(sender_id=recipient.id, recipient_id=current_user.id, read=False).\
+        update({'read': True}, synchronize_session=False)
     db.session.commit()
     
-    # Combine and sort messages by date
-    messages = sorted(sent_messages + received_messages, key=lambda x: x.date_sent)
+    # All messages between current user and recipient, oldest first
+    messages = Message.query.filter(
+        ((Message.sender_id == current_user.id) & (Message.recipient_id == recipient.id)) |
+        ((Message.sender_id == recipient.id) & (Message.recipient_id == current_user.id))
+    ).order_by(Message.date_sent, Message.id).all()
     
     return render_template('conversation.html', title=f"Conversation with {recipient.username}", form=form, recipient=recipient, messages=messages)
 
 
 @main_bp.route("/assets")
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.MANAGE_ASSETS)
 def assets():
-    all_assets = Asset.query.all()
+    all_assets = Asset.query.options(joinedload(Asset.holder)).all()
     form = EmptyForm()
     return render_template('assets.html', title='Asset Management', assets=all_assets, form=form)
 
 
+@main_bp.route("/assets/analytics")
+@login_required
+@permission_required(Permission.MANAGE_ASSETS)
+def asset_analytics():
+    try:
+        period = month_start(datetime.datetime.strptime(request.args.get('period', ''), '%Y-%m'))
+    except ValueError:
+        period = month_start(datetime.date.today())
+    report = usage_report(period)
+    return render_template('asset_analytics.html', title='Asset Utilization', report=report, period=period)
+
+
+@main_bp.route("/asset/<int:asset_id>/history")
+@login_required
+@permission_required(Permission.MANAGE_ASSETS)
+def asset_history(asset_id):
+    asset = Asset.query.get_or_404(asset_id)
+    # ?archived=1 pages through the archived logs too (see wms.archive)
+    archived = request.args.get('archived', 0, type=int) == 1
+    log = with_archive(AssetLog) if archived else AssetLog
+    query = db.session.query(log).options(joinedload(log.user)).filter(log.asset_id == asset.id)
+    logs, next_cursor = keyset_page(query, log.check_out_time, log.id, request.args.get('before'))
+    return render_template('asset_history.html', title=f'{asset.name} History', asset=asset, logs=logs,
+                           next_cursor=next_cursor, archived=archived)
+
+
 @main_bp.route("/asset/new", methods=['GET', 'POST'])
 @login_required
-@roles_required('Admin', 'Manager')
+@permission_required(Permission.MANAGE_ASSETS)
 def new_asset():
     form = AssetForm()
     if form.validate_on_submit():
@@ -521,14 +828,11 @@ def new_asset():
 @login_required
 def checkout_asset(asset_id):
     asset = Asset.query.get_or_404(asset_id)
-    if asset.status != 'Available':
-        flash('This asset is not available to be checked out.', 'danger')
-    else:
-        asset.status = 'Checked Out'
-        asset_log = AssetLog(user=current_user, asset=asset)
-        db.session.add(asset_log)
-        db.session.commit()
+    try:
+        check_out(asset, current_user)
         flash(f"You have checked out {asset.name}.", 'success')
+    except AssetTransitionError as e:
+        flash(str(e), 'danger')
     return redirect(url_for('main.assets'))
 
 
@@ -536,26 +840,18 @@ def checkout_asset(asset_id):
 @login_required
 def checkin_asset(asset_id):
     asset = Asset.query.get_or_404(asset_id)
-    asset_log = AssetLog.query.filter_by(asset_id=asset.id, check_in_time=None).first()
-
-    if asset.status != 'Checked Out' or not asset_log:
-        flash('This asset cannot be checked in.', 'danger')
-    else:
-        if asset_log.user != current_user and current_user.role not in ['Admin', 'Manager']:
-            flash('You can only check in assets that you have checked out.', 'danger')
-        else:
-            asset.status = 'Available'
-            asset_log.check_in_time = datetime.datetime.utcnow()
-            db.session.commit()
-            flash(f"You have checked in {asset.name}.", 'success')
-
+    try:
+        check_in(asset, current_user)
+        flash(f"You have checked in {asset.name}.", 'success')
+    except AssetTransitionError as e:
+        flash(str(e), 'danger')
     return redirect(url_for('main.assets'))
 
 
 # --- NEW ROUTE -------------------------------------------------------
 @main_bp.route("/payslip/upload", methods=['GET', 'POST'])
 @login_required
-@roles_required('Admin', 'Manager')        # ← NEW line (access control)
+@permission_required(Permission.MANAGE_DOCUMENTS)        # ← NEW line (access control)
 def upload_payslip():
     form = PayslipUploadForm()
     if form.validate_on_submit():
@@ -593,8 +889,10 @@ def my_documents():
 def inject_unread_messages_count():
     if current_user.is_authenticated:
         unread_count = Message.query.filter_by(recipient_id=current_user.id, read=False).count()
-        return {'unread_messages_count': unread_count}
-    return {'unread_messages_count': 0}
+        return {'unread_messages_count': unread_count,
+                'unread_announcements_count': unread_announcement_count(current_user),
+                'unread_notifications_count': Notification.query.filter_by(user_id=current_user.id, read=False).count()}
+    return {'unread_messages_count': 0, 'unread_announcements_count': 0, 'unread_notifications_count': 0}
 
 # Add these imports at the top of the file
 import os
@@ -652,18 +950,58 @@ def profile_picture():
     return render_template('profile_picture.html', title='Profile Picture', form=form)
 
 
+@main_bp.route("/admin/profiles")
+@login_required
+@permission_required(Permission.MANAGE_USERS)
+def admin_profiles():
+    if not profiler.enabled():
+        abort(404)
+    return render_template('admin_profiles.html', title='Request Profiles', profiles=profiler.list_profiles(),
+                           token=profiler.make_token(), header=profiler.HEADER)
+
+
+@main_bp.route("/admin/profiles/<profile_id>.<kind>")
+@login_required
+@permission_required(Permission.MANAGE_USERS)
+def download_profile(profile_id, kind):
+    filename = profiler.enabled() and profiler.profile_file(profile_id, kind)
+    if not filename:
+        abort(404)
+    return send_from_directory(current_app.config['PROFILER_DIR'], filename, as_attachment=True)
+
+
+@main_bp.route("/admin/audit")
+@login_required
+@permission_required(Permission.MANAGE_USERS)
+@read_only
+def admin_audit():
+    # Filters: ?action=, ?target_type= (with ?target_id=), ?actor_id=; ?before= pages back
+    filters = {'action': request.args.get('action') or None,
+               'target_type': request.args.get('target_type') or None,
+               'target_id': request.args.get('target_id', type=int),
+               'actor_id': request.args.get('actor_id', type=int)}
+    page, next_cursor = audit.events(cursor=request.args.get('before'),
+                                     per_page=current_app.config['AUDIT_EVENTS_PER_PAGE'], **filters)
+    return render_template('admin_audit.html', title='Audit Log', events=page, next_cursor=next_cursor,
+                           filters=filters, actions=audit.ACTIONS, describe=audit.describe)
+
+
 @main_bp.route("/admin/reset_password", methods=['GET', 'POST'])
 @login_required
-@roles_required('Admin')
+@permission_required(Permission.MANAGE_USERS)
 def admin_reset_password():
     form = AdminPasswordResetForm()
-    users = User.query.all()
+    users = User.query.options(joinedload(User.profile_picture)).all()
     
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user:
             user.set_password(form.new_password.data)
+            user.revoke_sessions()
+            audit.record('user.password_reset', 'user', user.id, after={'sessions_revoked': True})
             db.session.commit()
+            if user == current_user:
+                login_user(user)
             flash(f'Password has been reset for {user.username}', 'success')
             return redirect(url_for('main.admin_reset_password'))
         else:
@@ -677,14 +1015,19 @@ def admin_reset_password():
 
 @main_bp.route('/admin/user/<int:user_id>/edit_role', methods=['POST'])
 @login_required
-@roles_required('Admin')
+@permission_required(Permission.MANAGE_USERS)
 def edit_user_role(user_id):
     user = User.query.get_or_404(user_id)
     new_role = request.form.get('role')
     
-    if new_role in ['Admin', 'Manager', 'Employee']:
-        user.role = new_role
+    if new_role in ROLES:
+        if user.role != new_role:
+            audit.record('user.role_changed', 'user', user.id, before={'role': user.role}, after={'role': new_role})
+            user.role = new_role
+            user.revoke_sessions()  # the user must log in again under the new role
         db.session.commit()
+        if user == current_user:
+            login_user(user)
         flash(f'User {user.username} role updated to {new_role}!', 'success')
     else:
         flash('Invalid role selected!', 'danger')
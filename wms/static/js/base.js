@@ -0,0 +1,193 @@
+// Site-wide behaviour: dark mode, search box, keyboard shortcuts and the custom cursor
+document.addEventListener('DOMContentLoaded', function() {
+    const darkModeToggle = document.getElementById('darkModeToggle');
+    const htmlElement = document.documentElement;
+    const icon = darkModeToggle.querySelector('i');
+
+    // Check for saved theme preference or use preferred color scheme
+    const savedTheme = localStorage.getItem('theme');
+    if (savedTheme) {
+        htmlElement.setAttribute('data-bs-theme', savedTheme);
+        updateIcon(savedTheme === 'dark');
+    } else {
+        // Use system preference as default
+        const prefersDark = window.matchMedia('(prefers-color-scheme: dark)').matches;
+        if (prefersDark) {
+            htmlElement.setAttribute('data-bs-theme', 'dark');
+            updateIcon(true);
+        }
+    }
+
+    // Toggle theme on button click
+    darkModeToggle.addEventListener('click', function() {
+        const currentTheme = htmlElement.getAttribute('data-bs-theme');
+        const newTheme = currentTheme === 'dark' ? 'light' : 'dark';
+
+        htmlElement.setAttribute('data-bs-theme', newTheme);
+        localStorage.setItem('theme', newTheme);
+
+        updateIcon(newTheme === 'dark');
+        updateFooter(newTheme);
+    });
+
+    // Update icon based on theme
+    function updateIcon(isDark) {
+        if (isDark) {
+            icon.classList.remove('fa-moon');
+            icon.classList.add('fa-sun');
+        } else {
+            icon.classList.remove('fa-sun');
+            icon.classList.add('fa-moon');
+        }
+    }
+
+    // Update footer based on theme
+    function updateFooter(theme) {
+        const footer = document.getElementById('footer');
+        if (theme === 'dark') {
+            footer.classList.remove('bg-light');
+            footer.classList.add('bg-dark');
+        } else {
+            footer.classList.remove('bg-dark');
+            footer.classList.add('bg-light');
+        }
+    }
+
+    // Set initial footer class
+    updateFooter(htmlElement.getAttribute('data-bs-theme'));
+
+    // Global Search Functionality
+    const searchInput = document.getElementById('globalSearch');
+    const searchResults = document.getElementById('searchResults');
+    let searchTimeout;
+
+    searchInput.addEventListener('input', function() {
+        clearTimeout(searchTimeout);
+        const query = this.value.trim();
+
+        if (query.length < 2) {
+            searchResults.style.display = 'none';
+            return;
+        }
+
+        searchTimeout = setTimeout(() => {
+            performSearch(query);
+        }, 300);
+    });
+
+    searchInput.addEventListener('focus', function() {
+        if (this.value.trim().length >= 2) {
+            searchResults.style.display = 'block';
+        }
+    });
+
+    document.addEventListener('click', function(e) {
+        if (!searchInput.contains(e.target) && !searchResults.contains(e.target)) {
+            searchResults.style.display = 'none';
+        }
+    });
+
+    function performSearch(query) {
+        // Simulate search results (replace with actual AJAX call)
+        const mockResults = [
+            { type: 'task', title: 'Complete project documentation', url: '/tasks/1' },
+            { type: 'user', title: 'John Doe', url: '/users/1' },
+            { type: 'document', title: 'Company Policy.pdf', url: '/documents/1' }
+        ].filter(item => item.title.toLowerCase().includes(query.toLowerCase()));
+
+        displaySearchResults(mockResults);
+    }
+
+    function displaySearchResults(results) {
+        if (results.length === 0) {
+            searchResults.innerHTML = '<div class="p-3 text-muted">No results found</div>';
+        } else {
+            searchResults.innerHTML = results.map(result => `
+                <a href="${result.url}" class="d-block p-3 text-decoration-none search-result-item">
+                    <div class="d-flex align-items-center">
+                        <i class="fas fa-${result.type === 'task' ? 'tasks' : result.type === 'user' ? 'user' : 'file'} me-2 text-primary"></i>
+                        <div>
+                            <div class="fw-medium text-dark">${result.title}</div>
+                            <small class="text-muted">${result.type}</small>
+                        </div>
+                    </div>
+                </a>
+            `).join('');
+        }
+        searchResults.style.display = 'block';
+    }
+});
+
+// Keyboard Shortcuts System
+document.addEventListener('keydown', function(e) {
+    // Only trigger shortcuts when not typing in input fields
+    if (e.target.tagName === 'INPUT' || e.target.tagName === 'TEXTAREA') {
+        return;
+    }
+
+    // Ctrl/Cmd + K - Focus search
+    if ((e.ctrlKey || e.metaKey) && e.key === 'k') {
+        e.preventDefault();
+        searchInput.focus();
+    }
+
+    // Ctrl/Cmd + N - New task (if user has permission)
+    if ((e.ctrlKey || e.metaKey) && e.key === 'n') {
+        e.preventDefault();
+        // Check if user can create tasks (admin/manager)
+        if (document.querySelector('[href*="create_task"]')) {
+            window.location.href = '/create_task';
+        } else {
+            showNotification('You don\'t have permission to create tasks', 'warning');
+        }
+    }
+
+    // Ctrl/Cmd + L - Leave request
+    if ((e.ctrlKey || e.metaKey) && e.key === 'l') {
+        e.preventDefault();
+        window.location.href = '/create_leave_request';
+    }
+
+    // Ctrl/Cmd + M - Messages
+    if ((e.ctrlKey || e.metaKey) && e.key === 'm') {
+        e.preventDefault();
+        window.location.href = '/messages';
+    }
+
+    // Escape - Close modals, clear search, etc.
+    if (e.key === 'Escape') {
+        searchResults.style.display = 'none';
+        searchInput.value = '';
+    }
+});
+
+// Custom cursor effects
+const cursor = document.querySelector('.custom-cursor');
+const follower = document.querySelector('.cursor-follower');
+
+document.addEventListener('mousemove', (e) => {
+    cursor.style.left = e.clientX - 10 + 'px';
+    cursor.style.top = e.clientY - 10 + 'px';
+
+    setTimeout(() => {
+        follower.style.left = e.clientX - 20 + 'px';
+        follower.style.top = e.clientY - 20 + 'px';
+    }, 100);
+});
+
+// Cursor hover effects
+const hoverElements = document.querySelectorAll('a, button, .btn, .nav-link, .card, .task-card');
+
+hoverElements.forEach(element => {
+    element.addEventListener('mouseenter', () => {
+        cursor.style.transform = 'scale(1.5)';
+        follower.style.transform = 'scale(1.2)';
+        follower.style.borderColor = 'rgba(67, 97, 238, 0.6)';
+    });
+
+    element.addEventListener('mouseleave', () => {
+        cursor.style.transform = 'scale(1)';
+        follower.style.transform = 'scale(1)';
+        follower.style.borderColor = 'rgba(67, 97, 238, 0.3)';
+    });
+});
@@ -0,0 +1,40 @@
+// Typeahead for the user picker fields (forms.UserPickerField): fills the
+// datalist from /api/users/search and copies the chosen user's id into the
+// hidden input next to the search box.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('input[data-user-picker]').forEach(function (input) {
+        var hidden = document.getElementById(input.dataset.userPicker);
+        var options = document.getElementById(input.getAttribute('list'));
+        var byLabel = {};
+        var timer = null;
+
+        function choose() {
+            var user = byLabel[input.value];
+            hidden.value = user ? user.id : '';
+        }
+
+        input.addEventListener('input', function () {
+            choose();
+            clearTimeout(timer);
+            var query = input.value.trim();
+            if (!query || byLabel[input.value]) {
+                return;
+            }
+            timer = setTimeout(function () {
+                fetch(input.dataset.source + '?q=' + encodeURIComponent(query), {credentials: 'same-origin'})
+                    .then(function (response) { return response.ok ? response.json() : {users: []}; })
+                    .then(function (data) {
+                        options.innerHTML = '';
+                        byLabel = {};
+                        data.users.forEach(function (user) {
+                            byLabel[user.label] = user;
+                            var option = document.createElement('option');
+                            option.value = user.label;
+                            options.appendChild(option);
+                        });
+                        choose();
+                    });
+            }, 200);
+        });
+    });
+});
@@ -0,0 +1,287 @@
+"""
+Static asset bundles.
+
+Pages include their scripts and styles by bundle name with
+``{{ asset_tags('app.js') }}``. ``flask build-assets`` concatenates each
+bundle's sources (BUNDLES), minifies the ones that aren't minified
+already, and writes them to static/dist/ under a content-hashed name
+(``app.3f9c2a1b7d4e.js``) listed in static/dist/manifest.json. Because a
+new build gets new names, the files are served with
+``Cache-Control: immutable`` and browsers never ask for them again.
+
+Third-party libraries live in static/vendor/ so the site works without
+internet access; ``flask vendor-assets`` downloads the pinned versions in
+VENDOR once, on a machine that has it. Until the bundles are built (in
+development), ``asset_tags`` links the source files one by one, and a
+vendor file that hasn't been downloaded yet falls back to its CDN URL.
+"""
+import hashlib
+import json
+import os
+import re
+import urllib.request
+
+from flask import current_app, request, url_for
+from markupsafe import Markup
+
+# Local path under static/ -> pinned download URL
+VENDOR = {
+    'vendor/bootstrap/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'vendor/echarts/echarts.min.js': 'https://cdn.jsdelivr.net/npm/echarts@5.4.3/dist/echarts.min.js',
+    'vendor/particles/particles.min.js': 'https://cdn.jsdelivr.net/npm/particles.js@2.0.0/particles.min.js',
+    'vendor/chartjs/chart.umd.min.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js',
+}
+
+# Bundle name -> source files under static/, in load order
+BUNDLES = {
+    'app.css': ['vendor/bootstrap/bootstrap.min.css', 'css/styles.css', 'css/base.css'],
+    'app.js': ['vendor/bootstrap/bootstrap.bundle.min.js', 'js/base.js', 'js/user_picker.js'],
+    'echarts.js': ['vendor/echarts/echarts.min.js'],
+    'particles.js': ['vendor/particles/particles.min.js', 'js/particles_background.js'],
+    'chart.js': ['vendor/chartjs/chart.umd.min.js'],
+}
+
+DIST = 'dist'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def init_app(app):
+    app.extensions['static_assets'] = {'manifest': _load_manifest(app.static_folder)}
+    app.jinja_env.globals['asset_tags'] = asset_tags
+    app.after_request(_cache_fingerprinted)
+
+
+def _load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _tag(bundle, url):
+    if bundle.endswith('.css'):
+        return f'<link rel="stylesheet" href="{url}">'
+    return f'<script src="{url}"></script>'
+
+
+def _source_url(path):
+    if path in VENDOR and not os.path.exists(os.path.join(current_app.static_folder, path)):
+        return VENDOR[path]
+    return url_for('static', filename=path)
+
+
+def asset_tags(bundle):
+    """The <script> or <link> tags that load ``bundle``."""
+    manifest = current_app.extensions['static_assets']['manifest']
+    if manifest and bundle in manifest:
+        return Markup(_tag(bundle, url_for('static', filename=f'{DIST}/{manifest[bundle]}')))
+    return Markup('\n'.join(_tag(bundle, _source_url(path)) for path in BUNDLES[bundle]))
+
+
+def _cache_fingerprinted(response):
+    if request.endpoint == 'static' and response.status_code == 200 and \
+            (request.view_args or {}).get('filename', '').startswith(DIST + '/'):
+        response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def minify_css(source):
+    """Drop comments and the whitespace CSS doesn't need (strings are left alone)."""
+    parts = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', source)
+    for i in range(0, len(parts), 2):
+        text = re.sub(r'/\*.*?\*/', '', parts[i], flags=re.S)
+        text = re.sub(r'\s+', ' ', text)
+        text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+        parts[i] = text.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+# After these characters a "/" starts a regular expression rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^\n')
+_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw')
+
+
+class _JsMinifier:
+    """Removes comments, indentation, blank lines and repeated spaces from JavaScript.
+
+    Line breaks are kept, so automatic semicolon insertion works exactly
+    as in the source; strings, template literals and regular expressions
+    are copied unchanged.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.i = 0
+        self.out = []
+
+    def _last(self):
+        for chunk in reversed(self.out):
+            stripped = chunk.rstrip(' ')
+            if stripped:
+                return stripped
+        return '\n'
+
+    def _emit_space(self):
+        if self.out and self.out[-1] not in (' ', '\n'):
+            self.out.append(' ')
+
+    def _emit_newline(self):
+        while self.out and self.out[-1] == ' ':
+            self.out.pop()
+        if self.out and self.out[-1] != '\n':
+            self.out.append('\n')
+
+    def _copy_string(self, quote):
+        start = self.i
+        self.i += 1
+        while self.i < len(self.source) and self.source[self.i] != quote:
+            self.i += 2 if self.source[self.i] == '\\' else 1
+        self.i += 1
+        self.out.append(self.source[start:self.i])
+
+    def _copy_template(self):
+        self.out.append('`')
+        self.i += 1
+        start = self.i
+        while self.i < len(self.source) and self.source[self.i] != '`':
+            if self.source[self.i] == '\\':
+                self.i += 2
+            elif self.source.startswith('${', self.i):
+                self.out.append(self.source[start:self.i + 2])
+                self.i += 2
+                self._code(until_brace=True)
+                self.out.append('}')
+                self.i += 1
+                start = self.i
+            else:
+                self.i += 1
+        self.out.append(self.source[start:self.i + 1])
+        self.i += 1
+
+    def _copy_regex(self):
+        start = self.i
+        self.i += 1
+        in_class = False
+        while self.i < len(self.source):
+            char = self.source[self.i]
+            if char == '\\':
+                self.i += 2
+                continue
+            if char == '[':
+                in_class = True
+            elif char == ']':
+                in_class = False
+            elif char == '/' and not in_class:
+                break
+            self.i += 1
+        self.i += 1
+        while self.i < len(self.source) and self.source[self.i].isalpha():
+            self.i += 1
+        self.out.append(self.source[start:self.i])
+
+    def _regex_allowed(self):
+        last = self._last()
+        return last[-1] in _REGEX_PRECEDERS or any(re.search(rf'\b{keyword}$', last) for keyword in _REGEX_KEYWORDS)
+
+    def _code(self, until_brace=False):
+        depth = 0
+        source = self.source
+        while self.i < len(source):
+            char = source[self.i]
+            if until_brace and char == '}' and depth == 0:
+                return
+            if char in '\'"':
+                self._copy_string(char)
+            elif char == '`':
+                self._copy_template()
+            elif source.startswith('//', self.i):
+                end = source.find('\n', self.i)
+                self.i = len(source) if end == -1 else end
+            elif source.startswith('/*', self.i):
+                end = source.find('*/', self.i + 2)
+                end = len(source) if end == -1 else end + 2
+                if '\n' in source[self.i:end]:
+                    self._emit_newline()
+                else:
+                    self._emit_space()
+                self.i = end
+            elif char == '/' and self._regex_allowed():
+                self._copy_regex()
+            elif char == '\n':
+                self._emit_newline()
+                self.i += 1
+            elif char in ' \t\r':
+                self._emit_space()
+                self.i += 1
+            else:
+                if char == '{':
+                    depth += 1
+                elif char == '}':
+                    depth -= 1
+                if self.out and self.out[-1] == ' ' and (len(self.out) == 1 or self.out[-2] == '\n'):
+                    self.out.pop()  # indentation
+                self.out.append(char)
+                self.i += 1
+
+    def minify(self):
+        self._code()
+        return ''.join(self.out).strip()
+
+
+def minify_js(source):
+    return _JsMinifier(source).minify()
+
+
+def _minify(path, content):
+    if '.min.' in os.path.basename(path):
+        return content
+    if path.endswith('.css'):
+        return minify_css(content)
+    return minify_js(content)
+
+
+def build(static_folder):
+    """Write every bundle to static/dist/ under its content hash plus the manifest; returns the manifest."""
+    missing = [path for paths in BUNDLES.values() for path in paths
+               if not os.path.exists(os.path.join(static_folder, path))]
+    if missing:
+        raise FileNotFoundError('Missing sources (run `flask vendor-assets` first): ' + ', '.join(missing))
+    dist = os.path.join(static_folder, DIST)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for bundle, paths in BUNDLES.items():
+        pieces = []
+        for path in paths:
+            with open(os.path.join(static_folder, path), encoding='utf-8') as f:
+                pieces.append(_minify(path, f.read()))
+        # A newline (and a semicolon for scripts) keeps one file's last statement out of the next
+        content = ('\n' if bundle.endswith('.css') else ';\n').join(pieces).encode('utf-8')
+        name, extension = bundle.rsplit('.', 1)
+        manifest[bundle] = f"{name}.{hashlib.sha256(content).hexdigest()[:12]}.{extension}"
+        with open(os.path.join(dist, manifest[bundle]), 'wb') as f:
+            f.write(content)
+    current = set(manifest.values()) | {'manifest.json'}
+    for filename in os.listdir(dist):
+        if filename not in current:
+            os.remove(os.path.join(dist, filename))
+    with open(os.path.join(dist, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def download_vendor(static_folder, force=False):
+    """Fetch the pinned third-party files into static/vendor/; returns the paths downloaded."""
+    fetched = []
+    for path, source in VENDOR.items():
+        target = os.path.join(static_folder, path)
+        if os.path.exists(target) and not force:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(source, timeout=60) as response:
+            content = response.read()
+        with open(target, 'wb') as f:
+            f.write(content)
+        fetched.append(path)
+    return fetched
\ No newline at end of file
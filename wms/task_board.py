@@ -0,0 +1,249 @@
+"""
+Task board: status transitions, per-status columns and status counters.
+
+Tasks move between the board's columns (STATUSES). A move is a
+conditional UPDATE on the task's current status, so two people dragging
+the same card at once can't both win, and every move adjusts the
+TaskStatusCount rows of the assignee in the same transaction. Analytics
+reads those counters instead of counting tasks.
+"""
+import datetime
+from collections import Counter
+
+from flask import url_for
+from sqlalchemy import or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from wms import db
+from wms.dashboard_cache import invalidate as invalidate_dashboard
+from wms.models import User, Task, TaskBatch, TaskStatusCount
+from wms.notifications import notify
+from wms.pagination import keyset_page
+from wms.permissions import Permission
+
+STATUSES = ('To Do', 'In Progress', 'Done')
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE for the counters
+_UPSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+class TaskTransitionError(Exception):
+    """Raised when a status change isn't allowed or loses to a concurrent change."""
+
+
+class TaskPermissionError(TaskTransitionError):
+    """Raised when the user may not move one of the tasks."""
+
+
+def can_move(user, task):
+    return user.id in (task.assigned_to_id, task.assigned_by_id) or user.can(Permission.MANAGE_TASKS)
+
+
+def _adjust_counts(deltas):
+    """Apply {(user_id, status): change} to the counters (no commit).
+
+    On SQLite and PostgreSQL this is one INSERT ... ON CONFLICT DO UPDATE
+    for every counter, so two requests creating the same missing counter
+    at once both land. Elsewhere users getting the same change to the
+    same status share one UPDATE and one INSERT for their missing rows.
+    """
+    rows = [{'user_id': user_id, 'status': status, 'count': change}
+            for (user_id, status), change in deltas.items() if change]
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in _UPSERTS:
+        table = TaskStatusCount.__table__
+        statement = _UPSERTS[dialect](table).values(rows)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['user_id', 'status'], set_={'count': table.c.count + statement.excluded.count}))
+        return
+    groups = {}
+    for row in rows:
+        groups.setdefault((row['status'], row['count']), []).append(row['user_id'])
+    for (status, change), user_ids in groups.items():
+        existing = {user_id for user_id, in db.session.query(TaskStatusCount.user_id).
+                    filter(TaskStatusCount.status == status, TaskStatusCount.user_id.in_(user_ids))}
+        if existing:
+            db.session.execute(
+                update(TaskStatusCount).
+                where(TaskStatusCount.status == status, TaskStatusCount.user_id.in_(existing)).
+                values(count=TaskStatusCount.count + change).
+                execution_options(synchronize_session=False))
+        missing = [user_id for user_id in user_ids if user_id not in existing]
+        if missing:
+            db.session.execute(TaskStatusCount.__table__.insert(), [
+                {'user_id': user_id, 'status': status, 'count': change} for user_id in missing])
+
+
+def record_new_tasks(tasks):
+    """Count freshly added tasks (no commit)."""
+    _adjust_counts(Counter((task.assigned_to_id, task.status or 'To Do') for task in tasks))
+
+
+def move_tasks(task_ids, status, user, expected=None):
+    """Move the tasks with ``task_ids`` to ``status`` and commit.
+
+    All or nothing: if any task is missing, not movable by ``user``, or no
+    longer in the status it was read in (or in ``expected``, when given),
+    nothing is changed and TaskTransitionError is raised. Tasks already in
+    ``status`` are left alone. Returns the number of tasks moved.
+    """
+    if status not in STATUSES:
+        raise TaskTransitionError(f"Unknown status '{status}'.")
+    task_ids = set(task_ids)
+    tasks = Task.query.filter(Task.id.in_(task_ids)).all() if task_ids else []
+    if len(tasks) != len(task_ids):
+        raise TaskTransitionError('Some of these tasks no longer exist.')
+    for task in tasks:
+        if not can_move(user, task):
+            raise TaskPermissionError(f"You can't move task {task.id}.")
+        if expected is not None and task.status != expected:
+            raise TaskTransitionError(f"Task {task.id} is no longer in '{expected}'.")
+
+    by_status = {}
+    for task in tasks:
+        if task.status != status:
+            by_status.setdefault(task.status, []).append(task)
+    deltas = Counter()
+    for current, group in by_status.items():
+        moved = db.session.execute(
+            update(Task).
+            where(Task.id.in_([task.id for task in group]), Task.status == current).
+            values(status=status).
+            execution_options(synchronize_session=False)).rowcount
+        if moved != len(group):
+            db.session.rollback()
+            raise TaskTransitionError('Some of these tasks were changed by someone else. Reload and try again.')
+        for task in group:
+            deltas[(task.assigned_to_id, current)] -= 1
+            deltas[(task.assigned_to_id, status)] += 1
+    _adjust_counts(deltas)
+    # The UPDATEs bypass the ORM, so the home page caches are told directly
+    invalidate_dashboard({user_id for group in by_status.values() for task in group
+                          for user_id in (task.assigned_to_id, task.assigned_by_id)}, 'tasks')
+    db.session.commit()
+    return sum(len(group) for group in by_status.values())
+
+
+def resolve_assignees(role=None, identifiers=()):
+    """Ids of the users with ``role`` plus those named (by username or email) in ``identifiers``.
+
+    Returns (user ids, identifiers that matched nobody).
+    """
+    user_ids = set()
+    if role:
+        user_ids.update(user_id for user_id, in db.session.query(User.id).filter(User.role == role))
+    identifiers = {identifier for identifier in identifiers if identifier}
+    unknown = set(identifiers)
+    if identifiers:
+        for user_id, username, email in db.session.query(User.id, User.username, User.email).\
+                filter(or_(User.username.in_(identifiers), User.email.in_(identifiers))):
+            user_ids.add(user_id)
+            unknown -= {username, email}
+    return sorted(user_ids), sorted(unknown)
+
+
+def assign_batch(title, description, priority, deadline, user_ids, assigned_by):
+    """Give one new task to each of ``user_ids`` and commit; returns the TaskBatch.
+
+    The tasks go in with a single multi-row INSERT, in the same transaction
+    as the batch row and the counter updates, so either everyone gets the
+    task or nobody does.
+    """
+    if isinstance(deadline, datetime.date) and not isinstance(deadline, datetime.datetime):
+        deadline = datetime.datetime.combine(deadline, datetime.time())
+    batch = TaskBatch(title=title, size=len(user_ids), created_by_id=assigned_by.id)
+    db.session.add(batch)
+    db.session.flush()
+    now = datetime.datetime.utcnow()
+    try:
+        db.session.execute(Task.__table__.insert(), [
+            {'title': title, 'description': description, 'priority': priority, 'deadline': deadline,
+             'status': 'To Do', 'date_posted': now, 'assigned_to_id': user_id, 'assigned_by_id': assigned_by.id,
+             'batch_id': batch.id}
+            for user_id in user_ids])
+        _adjust_counts({(user_id, 'To Do'): 1 for user_id in user_ids})
+        invalidate_dashboard(list(user_ids) + [assigned_by.id], 'tasks')
+        notify([user_id for user_id in user_ids if user_id != assigned_by.id], 'task_assigned',
+               f'New task: {title}', f"{assigned_by.username} assigned you '{title}', due {deadline:%b %d, %Y}.", url_for('main.home'))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return batch
+
+
+def move_batch(batch_id, status, user):
+    """Move every task of a batch to ``status`` with set-based UPDATEs and commit.
+
+    Each source status is one UPDATE ... RETURNING the assignees it
+    changed, so the counters follow exactly the rows that moved, even if
+    some were moved individually in the meantime. Returns the number moved.
+    """
+    if status not in STATUSES:
+        raise TaskTransitionError(f"Unknown status '{status}'.")
+    if not user.can(Permission.MANAGE_TASKS):
+        raise TaskPermissionError("You can't move this batch.")
+    deltas = Counter()
+    touched = set()
+    for current in STATUSES:
+        if current == status:
+            continue
+        moved = db.session.execute(
+            update(Task).
+            where(Task.batch_id == batch_id, Task.status == current).
+            values(status=status).
+            returning(Task.assigned_to_id, Task.assigned_by_id).
+            execution_options(synchronize_session=False)).all()
+        for user_id, assigned_by_id in moved:
+            deltas[(user_id, current)] -= 1
+            deltas[(user_id, status)] += 1
+            touched.update((user_id, assigned_by_id))
+    _adjust_counts(deltas)
+    invalidate_dashboard(touched, 'tasks')
+    db.session.commit()
+    return sum(change for (_, current), change in deltas.items() if current == status)
+
+
+def batch_summary(batch_id):
+    """{status: count} for the tasks of a batch (one GROUP BY on the batch_id index)."""
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(db.session.query(Task.status, db.func.count(Task.id)).
+                  filter(Task.batch_id == batch_id).group_by(Task.status).all())
+    return counts
+
+
+def column(user_id, status, cursor=None, per_page=20):
+    """One page of ``user_id``'s tasks in ``status``, soonest deadline first, and the next cursor."""
+    query = Task.query.filter(Task.assigned_to_id == user_id, Task.status == status)
+    return keyset_page(query, Task.deadline, Task.id, cursor, per_page, descending=False)
+
+
+def status_counts(user_ids=None):
+    """{user_id: {status: count}} from the counters, for ``user_ids`` or everyone."""
+    query = db.session.query(TaskStatusCount.user_id, TaskStatusCount.status, TaskStatusCount.count)
+    if user_ids is not None:
+        query = query.filter(TaskStatusCount.user_id.in_(user_ids))
+    counts = {}
+    for user_id, status, count in query:
+        counts.setdefault(user_id, dict.fromkeys(STATUSES, 0))[status] = count
+    return counts
+
+
+def rebuild_counts():
+    """Recompute every counter from the task table and commit. Returns the number of rows."""
+    rows = db.session.query(Task.assigned_to_id, Task.status, db.func.count(Task.id)).\
+        group_by(Task.assigned_to_id, Task.status).all()
+    TaskStatusCount.query.delete()
+    if rows:
+        db.session.execute(TaskStatusCount.__table__.insert(), [
+            {'user_id': user_id, 'status': status, 'count': count} for user_id, status, count in rows])
+    db.session.commit()
+    return len(rows)
+
+
+def task_json(task):
+    return {'id': task.id, 'title': task.title, 'priority': task.priority, 'status': task.status,
+            'deadline': task.deadline.isoformat(), 'assigned_to_id': task.assigned_to_id,
+            'assigned_by_id': task.assigned_by_id}
\ No newline at end of file
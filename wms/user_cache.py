@@ -0,0 +1,70 @@
+"""
+Session-user cache for Flask-Login.
+
+``load_user`` runs on every request. Instead of a fresh ``SELECT`` (plus a
+lazy load of the profile picture when the navbar renders the avatar), the
+user is loaded once with the picture eagerly joined, detached, and kept in a
+short-TTL per-process LRU. Each request re-attaches a copy with
+``session.merge(load=False)``, which issues no SQL but still gives routes a
+normal persistent ``User`` whose relationships lazy-load as before.
+
+Any committed change to a User or ProfilePicture evicts that user from this
+process's cache; other workers pick the change up when the TTL expires.
+"""
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, defer
+
+from wms import db
+from wms.cache import LRUCache
+from wms.models import User, ProfilePicture
+
+
+def init_app(app):
+    app.extensions['user_cache'] = LRUCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+    if not event.contains(db.session, 'after_flush', _collect_stale_users):
+        event.listen(db.session, 'after_flush', _collect_stale_users)
+        event.listen(db.session, 'after_commit', _evict_stale_users)
+        event.listen(db.session, 'after_rollback', _discard_stale_users)
+
+
+def _cache():
+    return current_app.extensions['user_cache']
+
+
+def load_session_user(user_id):
+    cached = _cache().get(user_id)
+    if cached is None:
+        cached = User.query.options(joinedload(User.profile_picture), defer(User.password_hash)).\
+            filter_by(id=user_id).first()
+        if cached is None:
+            return None
+        if cached.profile_picture is not None:
+            db.session.expunge(cached.profile_picture)
+        db.session.expunge(cached)
+        _cache().set(user_id, cached)
+    return db.session.merge(cached, load=False)
+
+
+def forget_user(user_id):
+    _cache().delete(user_id)
+
+
+def _collect_stale_users(session, flush_context):
+    stale = session.info.setdefault('stale_user_ids', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            stale.add(obj.id)
+        elif isinstance(obj, ProfilePicture) and obj.user_id is not None:
+            stale.add(obj.user_id)
+
+
+def _evict_stale_users(session):
+    # Evict only once the change is committed, so a concurrent request can't
+    # re-cache the old row between our flush and our commit.
+    for user_id in session.info.pop('stale_user_ids', ()):
+        forget_user(user_id)
+
+
+def _discard_stale_users(session):
+    session.info.pop('stale_user_ids', None)
\ No newline at end of file
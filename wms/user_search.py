@@ -0,0 +1,32 @@
+"""
+Typeahead lookup behind the user picker.
+
+Matching is a case-insensitive prefix match on username or email, written
+as a range over lower(column) (``>= prefix`` and ``< next prefix``) so it
+can walk the ix_user_*_lower expression indexes on both SQLite and
+PostgreSQL, where ``LIKE 'abc%'`` generally can't.
+"""
+from wms import db
+from wms.models import User
+
+
+def _prefix_range(column, prefix):
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    lowered = db.func.lower(column)
+    return (lowered >= prefix) & (lowered < upper)
+
+
+def search_users(prefix, limit=10):
+    """Up to ``limit`` users whose username or email starts with ``prefix``, ordered by username."""
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return []
+    found = {}
+    for column in (User.username, User.email):
+        for user in User.query.filter(_prefix_range(column, prefix)).order_by(db.func.lower(column)).limit(limit):
+            found.setdefault(user.id, user)
+    return sorted(found.values(), key=lambda user: user.username.lower())[:limit]
+
+
+def user_label(user):
+    return f"{user.username} ({user.email})"
\ No newline at end of file